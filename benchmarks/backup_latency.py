@@ -0,0 +1,113 @@
+"""Задержка типичных операций обработчиков во время онлайн-бэкапа.
+
+Сравнивает латентность «обработчика» (запись профиля + чтение списка
+лекарств) без бэкапа и во время работы BackupManager в фоновом потоке.
+
+Пример:
+    python benchmarks/backup_latency.py --medications 200000 --output backup.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from backup import BackupManager  # noqa: E402
+from database import Database  # noqa: E402
+from load_test import MEDICATION_NAMES, percentile, random_schedule  # noqa: E402
+
+
+def seed(db, medications, rng):
+    users = max(1, medications // 3)
+    conn = db.get_connection()
+    with conn:
+        conn.executemany(
+            'INSERT INTO users (user_id, username, first_name) VALUES (?, ?, ?)',
+            ((user_id, f'user{user_id}', f'User{user_id}') for user_id in range(1, users + 1))
+        )
+        conn.executemany(
+            'INSERT INTO medications (user_id, name, dosage, schedule) VALUES (?, ?, ?, ?)',
+            ((rng.randrange(1, users + 1), rng.choice(MEDICATION_NAMES), '1 таблетка', random_schedule(rng))
+             for _ in range(medications))
+        )
+    conn.close()
+    return users
+
+
+def handler_latencies(db, users, duration, rng, stop=None):
+    """Повторяет операции обработчика duration секунд (или до stop); возвращает латентности"""
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline and not (stop and stop.is_set()):
+        user_id = rng.randrange(1, users + 1)
+        started = time.perf_counter()
+        db.add_user(user_id, f'user{user_id}', f'User{user_id}', None)
+        db.get_user_medications(user_id)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def summarize(latencies):
+    return {
+        'operations': len(latencies),
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'max_ms': max(latencies) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Handler latency while an online backup is running')
+    parser.add_argument('--medications', type=int, default=200000)
+    parser.add_argument('--duration', type=float, default=3.0, help='baseline measurement, seconds')
+    parser.add_argument('--pages', type=int, default=256, help='pages per backup step')
+    parser.add_argument('--step-pause', type=float, default=0.005, help='pause between backup steps, seconds')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'medications.db'))
+        users = seed(db, args.medications, rng)
+        manager = BackupManager(db.db_path, os.path.join(tmp, 'backups'),
+                                pages=args.pages, step_pause=args.step_pause)
+
+        baseline = handler_latencies(db, users, args.duration, rng)
+
+        done = threading.Event()
+        backup_result = {}
+
+        def run_backup():
+            started = time.perf_counter()
+            path = manager.create_backup()
+            backup_result['seconds'] = time.perf_counter() - started
+            backup_result['bytes'] = os.path.getsize(path)
+            done.set()
+
+        thread = threading.Thread(target=run_backup)
+        thread.start()
+        during = handler_latencies(db, users, 3600, rng, stop=done)
+        thread.join()
+
+    results = {
+        'medications': args.medications,
+        'pages_per_step': args.pages,
+        'step_pause': args.step_pause,
+        'backup': backup_result,
+        'baseline': summarize(baseline),
+        'during_backup': summarize(during),
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""Время холодного запуска бота против локальной заглушки Bot API.
+
+Запускает src/bot.py отдельным процессом на заполненной базе и измеряет:
+- time_to_first_update - от запуска процесса до ответа на /start;
+- time_to_schedule_ready - от запуска процесса до загрузки расписания.
+
+Первый запуск идет без снимка расписания (чтение всех лекарств из базы),
+второй - со снимком, записанным первым запуском.
+
+Пример:
+    python benchmarks/cold_start.py --medications 200000 --output cold_start.json
+"""
+import argparse
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, 'src'))
+
+from backup_latency import seed  # noqa: E402
+from database import Database  # noqa: E402
+from fake_telegram import FakeTelegramServer  # noqa: E402
+from load_test import TOKEN, git_revision  # noqa: E402
+
+READY_MARKER = 'Schedule ready from '
+USER_ID = 42
+
+
+def start_update(update_id):
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': USER_ID, 'type': 'private'},
+            'from': {'id': USER_ID, 'is_bot': False, 'first_name': 'Bench'},
+            'text': '/start',
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': 6}],
+        },
+    }
+
+
+def measure_start(fake, db_path, snapshot_path, update_id, timeout):
+    """Один запуск бота; возвращает словарь с временами в секундах"""
+    first_reply = threading.Event()
+    schedule_ready = threading.Event()
+    marks = {}
+
+    def on_request(method, params, received_at, status):
+        if method in ('sendPhoto', 'sendMessage') and status == 200 and not first_reply.is_set():
+            marks['first_update'] = received_at
+            first_reply.set()
+
+    fake.listeners.clear()
+    fake.add_listener(on_request)
+    # Обновление ждет в очереди с момента запуска, как после простоя бота
+    fake.push_update(start_update(update_id))
+
+    env = dict(
+        os.environ,
+        BOT_TOKEN=TOKEN,
+        TELEGRAM_API_URL=fake.base_url,
+        DB_PATH=db_path,
+        SCHEDULE_SNAPSHOT_PATH=snapshot_path,
+        BACKUP_INTERVAL_HOURS='0',
+        CATCH_UP_SECONDS='0',
+        PYTHONUNBUFFERED='1',
+    )
+    env.pop('METRICS_PORT', None)
+    started = time.monotonic()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT_DIR, 'src', 'bot.py')],
+        cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        text=True, encoding='utf-8', errors='replace'
+    )
+
+    def read_log():
+        for line in process.stderr:
+            if READY_MARKER in line and not schedule_ready.is_set():
+                marks['schedule_ready'] = time.monotonic()
+                marks['schedule_source'] = line.split(READY_MARKER, 1)[1].split()[0]
+                schedule_ready.set()
+
+    reader = threading.Thread(target=read_log, daemon=True)
+    reader.start()
+    try:
+        first_reply.wait(timeout)
+        schedule_ready.wait(max(0.0, timeout - (time.monotonic() - started)))
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        reader.join(timeout=5)
+        fake.listeners.clear()
+
+    return {
+        'time_to_first_update': marks['first_update'] - started if 'first_update' in marks else None,
+        'time_to_schedule_ready': marks['schedule_ready'] - started if 'schedule_ready' in marks else None,
+        'schedule_source': marks.get('schedule_source'),
+        'exit_code': process.returncode,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bot cold start: time to first update and to schedule ready')
+    parser.add_argument('--medications', type=int, default=100000)
+    parser.add_argument('--latency', type=float, default=0.0, help='fake API latency per request, seconds')
+    parser.add_argument('--timeout', type=float, default=120.0, help='per start, seconds')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp, FakeTelegramServer(latency=args.latency) as fake:
+        db_path = os.path.join(tmp, 'medications.db')
+        snapshot_path = os.path.join(tmp, 'schedule_snapshot.json')
+        seed(Database(db_path), args.medications, rng)
+
+        without_snapshot = measure_start(fake, db_path, snapshot_path, 1, args.timeout)
+        with_snapshot = measure_start(fake, db_path, snapshot_path, 2, args.timeout)
+        snapshot_bytes = os.path.getsize(snapshot_path) if os.path.exists(snapshot_path) else None
+
+    results = {
+        'revision': git_revision(),
+        'medications': args.medications,
+        'latency': args.latency,
+        'snapshot_bytes': snapshot_bytes,
+        'without_snapshot': without_snapshot,
+        'with_snapshot': with_snapshot,
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
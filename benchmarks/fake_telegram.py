@@ -0,0 +1,202 @@
+"""Локальная заглушка Telegram Bot API для нагрузочных тестов.
+
+Поддерживает методы, которыми пользуется бот: getMe, getUpdates,
+sendMessage, editMessageText, answerCallbackQuery и др. Позволяет задать
+искусственную задержку ответа и долю ответов 429 Too Many Requests.
+"""
+import json
+import random
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+BOT_USER = {
+    'id': 1,
+    'is_bot': True,
+    'first_name': 'FakeBot',
+    'username': 'fake_bot',
+    'can_join_groups': False,
+    'can_read_all_group_messages': False,
+    'supports_inline_queries': False,
+}
+
+
+class _Server(ThreadingHTTPServer):
+    # Очередь listen() с запасом над пулом соединений бота (SEND_POOL_SIZE):
+    # при стандартных 5 переполнение очереди выглядело бы как ошибки отправки бота
+    request_queue_size = 128
+
+
+class FakeTelegramServer:
+    """HTTP-сервер, имитирующий Bot API, в фоновом потоке"""
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0,
+                 rate_limit_ratio=0.0, retry_after=1, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after = retry_after
+        self.calls = Counter()
+        self.rate_limited = Counter()
+        self.listeners = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._updates = deque()
+        self._updates_ready = threading.Condition(self._lock)
+        self._message_id = 0
+        self._server = _Server((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/bot"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-telegram', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._updates_ready:
+            self._updates_ready.notify_all()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def push_update(self, update):
+        """Ставит update в очередь для getUpdates"""
+        with self._updates_ready:
+            self._updates.append(update)
+            self._updates_ready.notify_all()
+
+    def add_listener(self, callback):
+        """callback(method, params, received_at, status) вызывается в потоке сервера на каждый запрос"""
+        self.listeners.append(callback)
+
+    def _next_message_id(self):
+        with self._lock:
+            self._message_id += 1
+            return self._message_id
+
+    def _get_updates(self, params):
+        offset = int(params.get('offset') or 0)
+        # Long polling ограничиваем секундой, чтобы сервер быстро останавливался
+        timeout = min(float(params.get('timeout') or 0), 1.0)
+        deadline = time.monotonic() + timeout
+        with self._updates_ready:
+            while self._updates and self._updates[0]['update_id'] < offset:
+                self._updates.popleft()
+            while not self._updates and time.monotonic() < deadline:
+                self._updates_ready.wait(deadline - time.monotonic())
+            return [update for update in self._updates if update['update_id'] >= offset]
+
+    def _message(self, params):
+        chat_id = int(params.get('chat_id') or 0)
+        return {
+            'message_id': int(params.get('message_id') or self._next_message_id()),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': BOT_USER,
+            'text': params.get('text') or params.get('caption') or '',
+        }
+
+    def dispatch(self, method, params):
+        """Возвращает (http_status, тело ответа) для вызова метода"""
+        if method != 'getUpdates' and self._random.random() < self.rate_limit_ratio:
+            with self._lock:
+                self.rate_limited[method] += 1
+            return 429, {
+                'ok': False,
+                'error_code': 429,
+                'description': f'Too Many Requests: retry after {self.retry_after}',
+                'parameters': {'retry_after': self.retry_after},
+            }
+
+        if method == 'getMe':
+            result = BOT_USER
+        elif method == 'getUpdates':
+            result = self._get_updates(params)
+        elif method in ('sendMessage', 'sendPhoto', 'sendDocument', 'editMessageText'):
+            result = self._message(params)
+        else:
+            # answerCallbackQuery, deleteWebhook, setMyCommands и т.п.
+            result = True
+        return 200, {'ok': True, 'result': result}
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Заголовки и тело уходят одним пакетом, без задержек Nagle/delayed ACK
+            disable_nagle_algorithm = True
+            wbufsize = -1
+
+            def do_POST(self):
+                received_at = time.monotonic()
+                method = self.path.rstrip('/').rsplit('/', 1)[-1]
+                params = self._read_params()
+                with server._lock:
+                    server.calls[method] += 1
+
+                status, payload = server.dispatch(method, params)
+                for listener in server.listeners:
+                    listener(method, params, received_at, status)
+
+                if method != 'getUpdates' and (server.latency or server.jitter):
+                    time.sleep(server.latency + server._random.random() * server.jitter)
+
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = do_POST
+
+            def _read_params(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                content_type = self.headers.get('Content-Type', '')
+                if content_type.startswith('application/json'):
+                    return json.loads(raw or b'{}')
+                if content_type.startswith('application/x-www-form-urlencoded'):
+                    return {key: values[0] for key, values in parse_qs(raw.decode('utf-8')).items()}
+                # multipart (файлы) разбирать не нужно
+                return {}
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Fake Telegram Bot API server')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds per request')
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--rate-limit-ratio', type=float, default=0.0, help='share of 429 responses')
+    args = parser.parse_args()
+
+    fake = FakeTelegramServer(port=args.port, latency=args.latency, jitter=args.jitter,
+                              rate_limit_ratio=args.rate_limit_ratio)
+    print(f"Serving fake Bot API at {fake.base_url} (set TELEGRAM_API_URL to this value)")
+    fake.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
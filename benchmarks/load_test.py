@@ -0,0 +1,251 @@
+"""Синтетический нагрузочный тест бота против локальной заглушки Bot API.
+
+Пример:
+    python benchmarks/load_test.py --users 5000 --latency 0.05 --output results.json
+
+Результаты пишутся в JSON, чтобы сравнивать версии между собой.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from fake_telegram import FakeTelegramServer  # noqa: E402
+from database import Database  # noqa: E402
+from scheduler import MedicationScheduler  # noqa: E402
+from metrics import SEND_ERRORS  # noqa: E402
+
+TOKEN = '123456:LOADTEST'
+
+# Типичные времена приема и их относительная популярность
+POPULAR_TIMES = [
+    ('08:00', 30), ('09:00', 15), ('07:30', 5), ('12:00', 10), ('13:00', 8),
+    ('14:00', 4), ('18:00', 5), ('20:00', 20), ('21:00', 12), ('22:00', 10),
+]
+MEDICATION_NAMES = ['Аспирин', 'Парацетамол', 'Метформин', 'Лизиноприл', 'Омепразол',
+                    'Витамин D', 'Амоксициллин', 'Ибупрофен', 'Аторвастатин', 'Л-тироксин']
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def random_schedule(rng):
+    """1-3 приема в день, в основном в «популярное» время, иногда в случайную минуту"""
+    times = set()
+    for _ in range(rng.choices([1, 2, 3], weights=[50, 35, 15])[0]):
+        if rng.random() < 0.85:
+            times.add(rng.choices([t for t, _ in POPULAR_TIMES], weights=[w for _, w in POPULAR_TIMES])[0])
+        else:
+            times.add(f"{rng.randrange(24):02d}:{rng.randrange(60):02d}")
+    return ", ".join(sorted(times))
+
+
+def seed_database(db, users, meds_per_user, rng):
+    """Заполняет базу через Database; возвращает список (user_id, name, dosage, time_str)"""
+    doses = []
+    for user_id in range(1, users + 1):
+        db.add_user(user_id, f"user{user_id}", f"User{user_id}", None)
+        for name in rng.sample(MEDICATION_NAMES, meds_per_user):
+            schedule = random_schedule(rng)
+            db.add_medication(user_id, name, '1 таблетка', schedule)
+            doses.extend((user_id, name, '1 таблетка', t) for t in schedule.split(', '))
+    return doses
+
+
+def measure_rebuild(scheduler):
+    """Время и память полной пересборки расписания"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    scheduler.schedule_medication_reminders()
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'seconds': elapsed,
+        'jobs': len(scheduler.scheduler.get_jobs()),
+        'retained_bytes': current,
+        'peak_bytes': peak,
+    }
+
+
+async def measure_peak_minute(scheduler, fake, doses):
+    """Рассылка всех напоминаний самой загруженной минуты (индекс уже построен measure_rebuild)"""
+    by_minute = Counter(time_str for _, _, _, time_str in doses)
+    peak_time, peak_count = by_minute.most_common(1)[0]
+    hour, minute = map(int, peak_time.split(':'))
+
+    received = []
+
+    def on_request(method, params, received_at, status):
+        if method == 'sendMessage' and status == 200:
+            received.append(received_at)
+
+    fake.add_listener(on_request)
+
+    started = time.monotonic()
+    # Так же, как это делает задание планировщика в нужную минуту
+    await scheduler._dispatch_minute(hour * 60 + minute)
+    finished = time.monotonic()
+    fake.listeners.clear()
+
+    lags = [at - started for at in received]
+    return {
+        'minute': peak_time,
+        'doses': peak_count,
+        'fan_out_seconds': finished - started,
+        'delivered': len(received),
+        'send_errors': {labels[0]: count for labels, count in SEND_ERRORS._values.items()},
+        'lag_p50_seconds': percentile(lags, 0.50),
+        'lag_p99_seconds': percentile(lags, 0.99),
+        'lag_max_seconds': max(lags) if lags else None,
+    }
+
+
+async def measure_callback_round_trip(scheduler, fake, samples):
+    """Время от появления callback-update до ответа бота editMessageText.
+    Кнопки в формате напоминаний: took_<id лекарства>_<время отправки>.
+    """
+    from telegram.ext import Application, CallbackQueryHandler
+
+    async def on_callback(update, context):
+        # Как ветка took_ в bot.button_handler
+        query = update.callback_query
+        await query.answer()
+        _, medication_id, reminder_sent_time = query.data.split('_')
+        medication_id = int(medication_id)
+        medication_name = scheduler.get_medication_name(medication_id, query.from_user.id) or "Лекарство"
+        await scheduler.handle_medication_taken(query, medication_name, int(reminder_sent_time), medication_id)
+
+    application = Application.builder().token(TOKEN).base_url(fake.base_url).build()
+    application.add_handler(CallbackQueryHandler(on_callback))
+
+    loop = asyncio.get_running_loop()
+    waiters = {}
+
+    def on_request(method, params, received_at, status):
+        if method == 'editMessageText' and status == 200:
+            future = waiters.pop(int(params.get('message_id') or 0), None)
+            if future is not None:
+                loop.call_soon_threadsafe(future.set_result, received_at)
+
+    fake.add_listener(on_request)
+    medications = list(scheduler.index.medications.values())
+    round_trips = []
+    failed = 0
+    async with application:
+        await application.start()
+        await application.updater.start_polling(poll_interval=0.0, timeout=1)
+        for n in range(1, samples + 1):
+            future = loop.create_future()
+            waiters[n] = future
+            sent_at = int(time.time()) - 60
+            medication = medications[(n - 1) % len(medications)]
+            pushed_at = time.monotonic()
+            fake.push_update({
+                'update_id': n,
+                'callback_query': {
+                    'id': str(n),
+                    'from': {'id': medication.user_id, 'is_bot': False, 'first_name': f'User{medication.user_id}'},
+                    'chat_instance': str(n),
+                    'data': f'took_{medication.id}_{sent_at}',
+                    'message': {
+                        'message_id': n,
+                        'date': sent_at,
+                        'chat': {'id': medication.user_id, 'type': 'private'},
+                        'text': 'reminder',
+                    },
+                },
+            })
+            try:
+                answered_at = await asyncio.wait_for(future, timeout=5)
+            except asyncio.TimeoutError:
+                # Ответ потерян (например, из-за инъекции 429)
+                waiters.pop(n, None)
+                failed += 1
+                continue
+            round_trips.append(answered_at - pushed_at)
+        await application.updater.stop()
+        await application.stop()
+    fake.listeners.clear()
+
+    return {
+        'samples': len(round_trips),
+        'failed': failed,
+        'p50_seconds': percentile(round_trips, 0.50),
+        'p99_seconds': percentile(round_trips, 0.99),
+        'mean_seconds': statistics.fmean(round_trips) if round_trips else None,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    results = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'params': vars(args),
+    }
+
+    with tempfile.TemporaryDirectory() as tmp, \
+            FakeTelegramServer(latency=args.latency, jitter=args.jitter,
+                               rate_limit_ratio=args.rate_limit_ratio, seed=args.seed) as fake:
+        db = Database(os.path.join(tmp, 'medications.db'))
+
+        started = time.perf_counter()
+        doses = seed_database(db, args.users, args.meds_per_user, rng)
+        results['seed'] = {'seconds': time.perf_counter() - started, 'doses': len(doses)}
+
+        scheduler = MedicationScheduler(TOKEN, db, base_url=fake.base_url)
+        results['rebuild'] = measure_rebuild(scheduler)
+        results['peak_minute'] = await measure_peak_minute(scheduler, fake, doses)
+        results['callback_round_trip'] = await measure_callback_round_trip(scheduler, fake, args.callbacks)
+        results['api_calls'] = dict(fake.calls)
+        results['rate_limited'] = dict(fake.rate_limited)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test against a local fake Telegram Bot API')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--meds-per-user', type=int, default=2)
+    parser.add_argument('--latency', type=float, default=0.05, help='fake API latency per request, seconds')
+    parser.add_argument('--jitter', type=float, default=0.02, help='extra random latency, seconds')
+    parser.add_argument('--rate-limit-ratio', type=float, default=0.0, help='share of 429 responses')
+    parser.add_argument('--callbacks', type=int, default=200, help='callback round-trip samples')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='bench_output.json')
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Память на одну запланированную дозу: по заданию на дозу vs компактный индекс.
+
+Пример:
+    python benchmarks/schedule_memory.py --medications 20000 --output memory.json
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import pytz  # noqa: E402
+from apscheduler.schedulers.asyncio import AsyncIOScheduler  # noqa: E402
+from apscheduler.triggers.cron import CronTrigger  # noqa: E402
+
+from load_test import MEDICATION_NAMES, random_schedule  # noqa: E402
+from schedule_model import ScheduleIndex  # noqa: E402
+
+
+def generate_rows(count, rng):
+    """Строки как из Database.get_all_medications(); строки создаются заново, как при чтении из БД"""
+    rows = []
+    for medication_id in range(1, count + 1):
+        name = ''.join(list(rng.choice(MEDICATION_NAMES)))
+        rows.append((medication_id, rng.randrange(1, count // 2 + 2), name, ''.join(list('1 таблетка')),
+                     random_schedule(rng)))
+    return rows
+
+
+async def _noop(*args):
+    pass
+
+
+def legacy_schedule(scheduler, rows):
+    """Прежняя схема: отдельное задание APScheduler на каждую дозу"""
+    for _, user_id, name, dosage, schedule in rows:
+        for time_str in (t.strip() for t in schedule.split(',')):
+            hour, minute = map(int, time_str.split(':'))
+            scheduler.add_job(
+                _noop,
+                CronTrigger(hour=hour, minute=minute, timezone='Europe/Moscow'),
+                args=[user_id, name, dosage, time_str],
+                id=f"med_{user_id}_{name}_{time_str}",
+                replace_existing=True
+            )
+
+
+def compact_schedule(scheduler, rows):
+    """Текущая схема: индекс в памяти и одно задание на занятую минуту суток"""
+    index = ScheduleIndex.from_rows(rows)
+    for minute in index.minutes():
+        scheduler.add_job(
+            _noop,
+            CronTrigger(hour=minute // 60, minute=minute % 60, timezone='Europe/Moscow'),
+            args=[minute],
+            id=f"tick_{minute}",
+            replace_existing=True
+        )
+    return index
+
+
+def measure(build, make_rows):
+    """Строки создаются под трассировкой и отбрасываются после сборки, как после чтения из БД"""
+    scheduler = AsyncIOScheduler(timezone=pytz.timezone('Europe/Moscow'))
+    gc.collect()
+    tracemalloc.start()
+    rows = make_rows()
+    keep = build(scheduler, rows)
+    del rows
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    jobs = len(scheduler.get_jobs())
+    del keep, scheduler
+    return retained, peak, jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bytes per scheduled dose, legacy vs compact schedule model')
+    parser.add_argument('--medications', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args()
+
+    def make_rows():
+        return generate_rows(args.medications, random.Random(args.seed))
+
+    rows = make_rows()
+    doses = sum(len(schedule.split(',')) for *_, schedule in rows)
+    # Повторяющиеся (user, name, time) в прежней схеме схлопывались через replace_existing
+    unique_doses = len({(user_id, name, t.strip()) for _, user_id, name, _, schedule in rows
+                        for t in schedule.split(',')})
+
+    del rows
+    results = {'medications': args.medications, 'doses': doses}
+    for label, build, dose_count in (('legacy', legacy_schedule, unique_doses),
+                                     ('compact', compact_schedule, doses)):
+        retained, peak, jobs = measure(build, make_rows)
+        results[label] = {
+            'jobs': jobs,
+            'retained_bytes': retained,
+            'peak_bytes': peak,
+            'bytes_per_dose': retained / dose_count if dose_count else None,
+        }
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
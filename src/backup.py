@@ -0,0 +1,211 @@
+"""Онлайн-резервные копии базы данных через SQLite backup API.
+
+Копирование идет небольшими порциями страниц с паузами между ними, поэтому
+бот продолжает читать и писать во время бэкапа. Рядом с каждой копией
+сохраняется файл .sha256 для проверки при восстановлении.
+
+Использование из командной строки (восстанавливать при остановленном боте):
+    python backup.py create
+    python backup.py list
+    python backup.py verify /app/data/backups/medications-20250101-080000.db
+    python backup.py restore /app/data/backups/medications-20250101-080000.db
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+BACKUP_PREFIX = 'medications-'
+BACKUP_SUFFIX = '.db'
+CHECKSUM_SUFFIX = '.sha256'
+
+
+class BackupError(Exception):
+    """Ошибка создания или проверки резервной копии"""
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BackupManager:
+    """Создание, ротация, проверка и восстановление резервных копий"""
+
+    def __init__(self, db_path, backup_dir, retention=7, pages=256, step_pause=0.005, max_restarts=5):
+        self.db_path = db_path
+        self.backup_dir = backup_dir
+        self.retention = retention
+        # Страниц за шаг и пауза между шагами: между шагами база не заблокирована
+        self.pages = pages
+        self.step_pause = step_pause
+        # Если базу постоянно меняют, пошаговое копирование начинается заново;
+        # после max_restarts копируем оставшееся одним шагом
+        self.max_restarts = max_restarts
+
+    def _copy(self, source, target, pages):
+        restarts = 0
+        last_remaining = None
+
+        def progress(status, remaining, total):
+            nonlocal restarts, last_remaining
+            if last_remaining is not None and remaining > last_remaining:
+                restarts += 1
+                if restarts > self.max_restarts:
+                    raise _TooManyRestarts()
+            last_remaining = remaining
+            if self.step_pause:
+                time.sleep(self.step_pause)
+
+        source.backup(target, pages=pages, progress=progress)
+        return restarts
+
+    def create_backup(self):
+        """Создает резервную копию; возвращает путь к файлу"""
+        os.makedirs(self.backup_dir, exist_ok=True)
+        name = f"{BACKUP_PREFIX}{time.strftime('%Y%m%d-%H%M%S')}{BACKUP_SUFFIX}"
+        path = os.path.join(self.backup_dir, name)
+        partial = path + '.partial'
+        started = time.perf_counter()
+
+        source = sqlite3.connect(self.db_path)
+        target = sqlite3.connect(partial)
+        try:
+            try:
+                restarts = self._copy(source, target, self.pages)
+            except _TooManyRestarts:
+                logger.warning("Backup restarted more than %d times, copying in one step", self.max_restarts)
+                restarts = self.max_restarts
+                self._copy(source, target, -1)
+            # Копия - самостоятельный файл без -wal/-shm
+            target.execute('PRAGMA journal_mode=DELETE')
+            result = target.execute('PRAGMA integrity_check').fetchone()[0]
+            if result != 'ok':
+                raise BackupError(f"integrity check failed: {result}")
+        except Exception:
+            target.close()
+            source.close()
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        target.close()
+        source.close()
+
+        checksum = file_sha256(partial)
+        os.replace(partial, path)
+        with open(path + CHECKSUM_SUFFIX, 'w', encoding='utf-8') as f:
+            f.write(f"{checksum}  {name}\n")
+
+        logger.info("Backup %s created in %.2f s (%d restarts)", path, time.perf_counter() - started, restarts)
+        return path
+
+    def list_backups(self):
+        """Пути к резервным копиям, от старых к новым"""
+        if not os.path.isdir(self.backup_dir):
+            return []
+        names = sorted(
+            name for name in os.listdir(self.backup_dir)
+            if name.startswith(BACKUP_PREFIX) and name.endswith(BACKUP_SUFFIX)
+        )
+        return [os.path.join(self.backup_dir, name) for name in names]
+
+    def prune(self):
+        """Удаляет старые копии сверх retention; возвращает удаленные пути"""
+        backups = self.list_backups()
+        removed = backups[:max(0, len(backups) - self.retention)]
+        for path in removed:
+            for stale in (path, path + CHECKSUM_SUFFIX):
+                if os.path.exists(stale):
+                    os.remove(stale)
+            logger.info("Old backup removed: %s", path)
+        return removed
+
+    def run(self):
+        """Плановый бэкап с ротацией (для фонового задания планировщика)"""
+        try:
+            path = self.create_backup()
+            self.prune()
+            return path
+        except Exception as e:
+            logger.error("Backup failed: %s", e)
+            return None
+
+    def verify(self, path):
+        """Проверяет контрольную сумму и целостность копии; при ошибке бросает BackupError"""
+        checksum_path = path + CHECKSUM_SUFFIX
+        if not os.path.exists(checksum_path):
+            raise BackupError(f"checksum file not found: {checksum_path}")
+        with open(checksum_path, encoding='utf-8') as f:
+            expected = f.read().split()[0]
+        actual = file_sha256(path)
+        if actual != expected:
+            raise BackupError(f"checksum mismatch for {path}: expected {expected}, got {actual}")
+
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            result = conn.execute('PRAGMA integrity_check').fetchone()[0]
+        finally:
+            conn.close()
+        if result != 'ok':
+            raise BackupError(f"integrity check failed for {path}: {result}")
+
+    def restore(self, path):
+        """Восстанавливает базу из проверенной копии"""
+        self.verify(path)
+        source = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        target = sqlite3.connect(self.db_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+        logger.info("Database %s restored from %s", self.db_path, path)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Medication bot database backups')
+    parser.add_argument('--db', default=os.getenv('DB_PATH', '/app/data/medications.db'))
+    parser.add_argument('--dir', default=os.getenv('BACKUP_DIR', '/app/data/backups'))
+    parser.add_argument('--retention', type=int, default=int(os.getenv('BACKUP_RETENTION', '7')))
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('create', help='create a backup and prune old ones')
+    subparsers.add_parser('list', help='list backups')
+    for command in ('verify', 'restore'):
+        subparser = subparsers.add_parser(command, help=f'{command} a backup file')
+        subparser.add_argument('path')
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    manager = BackupManager(args.db, args.dir, retention=args.retention)
+
+    try:
+        if args.command == 'create':
+            print(manager.create_backup())
+            manager.prune()
+        elif args.command == 'list':
+            for path in manager.list_backups():
+                print(path)
+        elif args.command == 'verify':
+            manager.verify(args.path)
+            print(f"OK: {args.path}")
+        elif args.command == 'restore':
+            manager.restore(args.path)
+            print(f"Restored {args.db} from {args.path}")
+    except BackupError as e:
+        parser.exit(1, f"error: {e}\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,36 +1,104 @@
 import os
+import asyncio
 import logging
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters, CallbackQueryHandler
+import signal
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InlineQueryResultArticle, InputTextMessageContent
+from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters, CallbackQueryHandler, InlineQueryHandler
 from dotenv import load_dotenv
 from database import Database
 from scheduler import MedicationScheduler
+from profiles import ProfileWriter
+from templates import templates
 from validators import MedicationValidator, UserInputValidator  
+from metrics import track_handler, start_metrics_server
+from profiling import profiler
+from logging_setup import setup_logging
 
-# Настройка логирования
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
+# Настройка логирования (через очередь и фоновый поток)
+setup_logging(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Загружаем токен из .env
 load_dotenv()
 BOT_TOKEN = os.getenv('BOT_TOKEN')
+# Альтернативный адрес Bot API (например, локальный сервер для нагрузочных тестов)
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL')
+# Порт HTTP-эндпоинта /metrics (Prometheus); если не задан - эндпоинт выключен
+METRICS_PORT = os.getenv('METRICS_PORT')
+# Telegram id администраторов через запятую
+ADMIN_IDS = {int(admin_id) for admin_id in os.getenv('ADMIN_IDS', '').split(',') if admin_id.strip()}
 
-# Инициализируем базу данных и планировщик
-db = Database()
-scheduler = MedicationScheduler(BOT_TOKEN, db)
+# Как часто накопленные изменения профилей пользователей пишутся в БД (секунды)
+PROFILE_FLUSH_INTERVAL = int(os.getenv('PROFILE_FLUSH_INTERVAL', '30'))
+
+# Резервные копии: каталог, период (часы, 0 - выключено) и сколько копий хранить
+BACKUP_DIR = os.getenv('BACKUP_DIR', '/app/data/backups')
+BACKUP_INTERVAL_HOURS = float(os.getenv('BACKUP_INTERVAL_HOURS', '24'))
+BACKUP_RETENTION = int(os.getenv('BACKUP_RETENTION', '7'))
+
+# Через сколько дней после удаления лекарство и его история переносятся в архив
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '180'))
+
+# Скорость рассылки сообщений всем пользователям (сообщений в секунду)
+BROADCAST_RATE = float(os.getenv('BROADCAST_RATE', '20'))
+
+# Сколько секунд при остановке ждать завершения начатых рассылок напоминаний
+SHUTDOWN_TIMEOUT = float(os.getenv('SHUTDOWN_TIMEOUT', '30'))
+
+# Путь к базе данных и к снимку расписания, с которым запуск не ждет чтения всех лекарств
+DB_PATH = os.getenv('DB_PATH', '/app/data/medications.db')
+SCHEDULE_SNAPSHOT_PATH = os.getenv('SCHEDULE_SNAPSHOT_PATH', '/app/data/schedule_snapshot.json')
+# Напоминания, пропущенные за столько секунд до запуска (перезапуск, падение), досылаются
+CATCH_UP_SECONDS = int(os.getenv('CATCH_UP_SECONDS', '600'))
+# Inline-подсказки названий: с какой длины ввода искать, сколько вариантов показывать,
+# сколько секунд Telegram кэширует ответ (словарь не меняется во время работы)
+INLINE_MIN_QUERY_LENGTH = 2
+INLINE_RESULTS_LIMIT = 20
+INLINE_CACHE_TIME = 3600
+
+# База данных и планировщик создаются в main(), а не при импорте модуля
+db = None
+profile_writer = None
+scheduler = None
+# Создаются при первом использовании (см. get_backup_manager, get_broadcaster)
+backup_manager = None
+broadcaster = None
+# Фоновая загрузка расписания после запуска (ссылка держится, чтобы задачу не собрал GC)
+warm_up_task = None
 
 # Хранилище для данных пользователей
 user_sessions = {}
 
+def get_backup_manager():
+    """BackupManager; модуль backup импортируется только при первом бэкапе"""
+    global backup_manager
+    if backup_manager is None:
+        from backup import BackupManager
+        backup_manager = BackupManager(db.db_path, BACKUP_DIR, retention=BACKUP_RETENTION)
+    return backup_manager
+
+def run_backup():
+    return get_backup_manager().run()
+
+def get_broadcaster():
+    """Broadcaster; модуль broadcast импортируется только при первой рассылке"""
+    global broadcaster
+    if broadcaster is None:
+        from broadcast import Broadcaster
+        broadcaster = Broadcaster(db, scheduler, rate=BROADCAST_RATE)
+    return broadcaster
+
+def is_admin(user_id):
+    """Проверяет, является ли пользователь администратором бота"""
+    return user_id in ADMIN_IDS
+
 def get_main_menu_keyboard():
     """Возвращает клавиатуру главного меню"""
     keyboard = [
         [InlineKeyboardButton("💊 Добавить лекарство", callback_data="add_medication")],
         [InlineKeyboardButton("📋 Мои лекарства", callback_data="my_medications")],
         [InlineKeyboardButton("🗑️ Удалить лекарство", callback_data="delete_medication")],
+        [InlineKeyboardButton("📤 Экспорт истории", callback_data="export")],
         [InlineKeyboardButton("ℹ️ Помощь", callback_data="help")]
     ]
     return InlineKeyboardMarkup(keyboard)
@@ -43,15 +111,17 @@ async def edit_or_reply_message(message, text, reply_markup=None, parse_mode='Ma
         return message
     except Exception as e:
         # Если редактирование невозможно, отправляем новое сообщение
-        logger.debug(f"Cannot edit message, sending new one: {e}")
+        logger.debug("Cannot edit message, sending new one: %s", e)
         return await message.reply_text(text, reply_markup=reply_markup, parse_mode=parse_mode)
 
+@track_handler('start')
+@profiler.profiled('start')
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик команды /start"""
     user = update.message.from_user
     
-    # Добавляем пользователя в базу
-    db.add_user(
+    # Запоминаем пользователя; в базу попадет только изменившийся профиль, пачкой
+    profile_writer.record(
         user_id=user.id,
         username=user.username,
         first_name=user.first_name,
@@ -59,23 +129,24 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     
     # Отправляем приветственную картинку
+    welcome_text = templates.render('welcome', locale=user.language_code, first_name=user.first_name)
     try:
         photo_file = open('assets/Hello.jpg', 'rb')
         await update.message.reply_photo(
             photo=photo_file,
-            caption=f"**Добро пожаловать, {user.first_name}!**\n\nЯ твой персональный помощник для регулярного приема лекарств!",
+            caption=welcome_text,
             parse_mode='Markdown'
         )
     except Exception as e:
-        logger.error(f"Error sending welcome photo: {e}")
-        await update.message.reply_text(
-            f"**Добро пожаловать, {user.first_name}!**\n\nЯ твой персональный помощник для регулярного приема лекарств!"
-        )
+        logger.error("Error sending welcome photo: %s", e)
+        await update.message.reply_text(welcome_text, parse_mode='Markdown')
     
     # Отправляем основное меню
     text = "💊 **ГЛАВНОЕ МЕНЮ** 💊\n\nВыберите действие:"
     await update.message.reply_text(text, reply_markup=get_main_menu_keyboard())
 
+@track_handler('button_handler')
+@profiler.profiled('button_handler')
 async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обрабатывает нажатия на inline-кнопки"""
     query = update.callback_query
@@ -94,10 +165,23 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await delete_medication_start(query)
     elif data == "help":
         await help_button(query)
+    elif data == "export":
+        await send_export(query.message, user_id)
+    elif data.startswith("pick_"):
+        await pick_medication_name(query, data[len("pick_"):])
     elif data.startswith("delete_"):
-        medication_id = data.split("_")[1]
+        medication_id = int(data.split("_")[1])
         await delete_medication_confirm(query, medication_id)
+    elif data.startswith("took_"):
+        _, medication_id, reminder_sent_time = data.split("_")
+        medication_id = int(medication_id)
+        medication_name = scheduler.get_medication_name(medication_id, user_id)
+        if medication_name is None:
+            # Чужое или несуществующее лекарство: прием записывается без привязки к нему
+            medication_name, medication_id = "Лекарство", None
+        await scheduler.handle_medication_taken(query, medication_name, int(reminder_sent_time), medication_id)
     elif data.startswith("taken_"):
+        # Кнопки напоминаний, отправленных до перехода на id лекарства
         parts = data.split("_")
         medication_name = parts[1]
         reminder_sent_time = int(parts[2])
@@ -113,7 +197,11 @@ async def start_add_medication(query):
     user_id = query.from_user.id
     user_sessions[user_id] = {'step': 'name'}
     
-    keyboard = [[InlineKeyboardButton("🔙", callback_data="main_menu")]]
+    keyboard = [
+        # Подсказки по мере ввода: открывает в этом чате строку "@бот <название>"
+        [InlineKeyboardButton("🔎 Найти в справочнике", switch_inline_query_current_chat="")],
+        [InlineKeyboardButton("🔙", callback_data="main_menu")]
+    ]
     reply_markup = InlineKeyboardMarkup(keyboard)
     
     text = (
@@ -146,8 +234,83 @@ async def handle_medication_name(update: Update, context: ContextTypes.DEFAULT_T
         )
         return
     
-    user_sessions[user_id]['name'] = medication_name
-    user_sessions[user_id]['step'] = 'dosage'
+    from drug_index import drug_index
+    
+    # Точное совпадение со словарем - берем каноническое написание
+    position = drug_index.find(medication_name)
+    if position is not None:
+        await ask_dosage(update.message, user_id, drug_index.name_at(position))
+        return
+    
+    # Иначе предлагаем похожие названия из словаря
+    suggestions = drug_index.suggest(medication_name, limit=5)
+    if suggestions:
+        user_sessions[user_id]['typed_name'] = medication_name
+        keyboard = [
+            [InlineKeyboardButton(f"💊 {drug_index.name_at(position)}", callback_data=f"pick_{position}")]
+            for position in suggestions
+        ]
+        keyboard.append([InlineKeyboardButton(f"✏️ Оставить «{medication_name}»", callback_data="pick_typed")])
+        keyboard.append([InlineKeyboardButton("🔙", callback_data="main_menu")])
+        await update.message.reply_text(
+            "🔎 Возможно, вы имели в виду:",
+            reply_markup=InlineKeyboardMarkup(keyboard)
+        )
+        return
+    
+    await ask_dosage(update.message, user_id, medication_name)
+
+@track_handler('inline_medication_name')
+@profiler.profiled('inline_medication_name')
+async def inline_medication_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Inline-режим: подсказывает названия из словаря по мере ввода"""
+    query = update.inline_query
+    prefix = query.query.strip()
+    if len(prefix) < INLINE_MIN_QUERY_LENGTH:
+        await query.answer([], cache_time=INLINE_CACHE_TIME)
+        return
+    
+    from drug_index import drug_index
+    
+    # Выбранное название отправляется в чат обычным сообщением и
+    # попадает в handle_medication_name как точное совпадение со словарем
+    results = [
+        InlineQueryResultArticle(
+            id=str(position),
+            title=drug_index.name_at(position),
+            input_message_content=InputTextMessageContent(drug_index.name_at(position))
+        )
+        for position in drug_index.complete(prefix, limit=INLINE_RESULTS_LIMIT)
+    ]
+    await query.answer(results, cache_time=INLINE_CACHE_TIME)
+
+async def pick_medication_name(query, choice):
+    """Обрабатывает выбор названия из подсказок словаря"""
+    user_id = query.from_user.id
+    session = user_sessions.get(user_id)
+    
+    if not session or session['step'] != 'name':
+        await show_main_menu(query)
+        return
+    
+    if choice == 'typed':
+        medication_name = session.get('typed_name')
+    else:
+        from drug_index import drug_index
+        medication_name = drug_index.name_at(int(choice))
+    
+    if not medication_name:
+        await show_main_menu(query)
+        return
+    
+    await ask_dosage(query.message, user_id, medication_name)
+
+async def ask_dosage(message, user_id, medication_name):
+    """Запоминает название и переходит к вводу дозировки"""
+    session = user_sessions[user_id]
+    session.pop('typed_name', None)
+    session['name'] = medication_name
+    session['step'] = 'dosage'
     
     keyboard = [[InlineKeyboardButton("🔙", callback_data="main_menu")]]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -157,7 +320,7 @@ async def handle_medication_name(update: Update, context: ContextTypes.DEFAULT_T
         "Теперь введите дозировку (например: '500 мг', '1 таблетка'):\n\n"
         "💡 *Максимум 30 символов*"
     )
-    await update.message.reply_text(text, reply_markup=reply_markup)
+    await message.reply_text(text, reply_markup=reply_markup)
 
 async def handle_medication_dosage(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обрабатывает ввод дозировки с валидацией"""
@@ -246,8 +409,14 @@ async def handle_medication_schedule(update: Update, context: ContextTypes.DEFAU
         schedule=validated_data['schedule']
     )
     
-    # Перезапускаем планировщик для нового лекарства
-    scheduler.schedule_medication_reminders()
+    # Добавляем лекарство в расписание (остальные напоминания не пересоздаются)
+    scheduler.upsert_medication(
+        medication_id,
+        user_id,
+        validated_data['name'],
+        validated_data['dosage'],
+        validated_data['schedule']
+    )
     
     # Очищаем сессию пользователя
     if user_id in user_sessions:
@@ -287,6 +456,7 @@ async def send_help_message(message):
 🗑️ **Удалить лекарство** - выбери лекарство для удаления
 ⏰ **Напоминания** - бот автоматически напомнит о приеме
 ✅ **Подтверждение приема** - нажимай "Я принял(а)" когда выпьешь лекарство
+📤 **Экспорт истории** - CSV со списком лекарств и историей приемов для врача (/export, /export zip - архивом)
 
 ⏰ **Формат времени:** "08:00, 20:00" для приема утром и вечером
 
@@ -385,8 +555,8 @@ async def delete_medication_confirm(query, medication_id):
     success = db.delete_medication(medication_id, user_id)
     
     if success:
-        # Перезапускаем планировщик
-        scheduler.schedule_medication_reminders()
+        # Убираем лекарство из расписания
+        scheduler.remove_medication(medication_id)
         
         success_text = (
             f"✅ **ЛЕКАРСТВО УДАЛЕНО** ✅\n\n"
@@ -408,6 +578,8 @@ async def delete_medication_confirm(query, medication_id):
             reply_markup
         )
 
+@track_handler('handle_message')
+@profiler.profiled('handle_message')
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обрабатывает все текстовые сообщения"""
     user_id = update.message.from_user.id
@@ -426,9 +598,163 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Если не в процессе - показываем главное меню
         await update.message.reply_text("💊 **ГЛАВНОЕ МЕНЮ** 💊\n\nВыберите действие:", reply_markup=get_main_menu_keyboard())
 
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик команды /profile [on|off] (только для администраторов)"""
+    if not is_admin(update.message.from_user.id):
+        return
+    
+    action = context.args[0].lower() if context.args else ''
+    if action == 'on':
+        profiler.enabled = True
+    elif action == 'off':
+        profiler.enabled = False
+    elif not action:
+        profiler.toggle()
+    
+    state = "включено" if profiler.enabled else "выключено"
+    await update.message.reply_text(
+        f"🔬 Профилирование {state}\n"
+        f"Доля выборки: {profiler.sample_rate:.2%}, порог: {profiler.slow_threshold * 1000:.0f} мс\n"
+        f"Каталог: {profiler.directory}"
+    )
+
+async def backup_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик команды /backup (только для администраторов)"""
+    if not is_admin(update.message.from_user.id):
+        return
+    
+    await update.message.reply_text("💾 Создаю резервную копию...")
+    # Копирование идет в отдельном потоке и не задерживает напоминания
+    path = await asyncio.to_thread(run_backup)
+    if path:
+        await update.message.reply_text(f"✅ Резервная копия создана: {os.path.basename(path)}")
+    else:
+        await update.message.reply_text("❌ Не удалось создать резервную копию, подробности в логе")
+
+async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик команды /broadcast <текст> (только для администраторов)"""
+    if not is_admin(update.message.from_user.id):
+        return
+    
+    # Берем текст целиком, сохраняя переносы строк
+    parts = update.message.text.split(maxsplit=1)
+    text = parts[1].strip() if len(parts) > 1 else ''
+    if not text:
+        await update.message.reply_text("Использование: /broadcast <текст сообщения>")
+        return
+    
+    broadcast_id = get_broadcaster().start(text, update.message.from_user.id)
+    await update.message.reply_text(
+        f"📣 Рассылка #{broadcast_id} запущена. Отчет придет по завершении."
+    )
+
+async def reload_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик команды /reload: перечитывает расписание из базы (только для администраторов)"""
+    if not is_admin(update.message.from_user.id):
+        return
+    
+    added, changed, removed = await scheduler.reload()
+    await update.message.reply_text(
+        f"🔄 Расписание обновлено\n\n"
+        f"➕ Добавлено: {added}\n"
+        f"✏️ Изменено: {changed}\n"
+        f"➖ Удалено: {removed}"
+    )
+
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик команды /export [zip]"""
+    compress = bool(context.args) and context.args[0].lower() == 'zip'
+    await send_export(update.message, update.message.from_user.id, compress)
+
+async def send_export(message, user_id, compress=False):
+    """Отправляет пользователю CSV с лекарствами и историей приемов"""
+    from export import MAX_UPLOAD_SIZE, build_user_export, file_size
+    
+    # Чтение из базы и запись файлов - в отдельном потоке, чтобы не задерживать другие обновления
+    files = await asyncio.to_thread(build_user_export, db, user_id, scheduler.timezone, compress)
+    try:
+        # Bot API не примет файл больше 50 МБ; проверяем до отправки, которая читает файл в память целиком
+        if any(file_size(buffer) > MAX_UPLOAD_SIZE for _, buffer in files):
+            hint = "" if compress else "\nПопробуйте сжатый архив: /export zip"
+            await message.reply_text(f"❌ Экспорт больше 50 МБ и не может быть отправлен в Telegram.{hint}")
+            return
+        for filename, buffer in files:
+            await message.reply_document(document=buffer, filename=filename)
+    finally:
+        for _, buffer in files:
+            buffer.close()
+    
+    await message.reply_text(
+        "📤 Экспорт готов: список лекарств и история приемов.\n"
+        "Файлы открываются в Excel или Google Таблицах."
+    )
+
+def archive_and_compact():
+    """Фоновое обслуживание базы: архивирование удаленных лекарств и incremental vacuum"""
+    try:
+        db.archive_inactive_medications(ARCHIVE_AFTER_DAYS)
+        db.incremental_vacuum()
+    except Exception as e:
+        logger.error("Database maintenance failed: %s", e)
+
+async def resume_broadcasts():
+    """Продолжает прерванные рассылки; модуль broadcast импортируется, только если они есть"""
+    broadcasts = await asyncio.to_thread(db.get_unfinished_broadcasts)
+    if broadcasts:
+        get_broadcaster().resume(broadcasts)
+
+async def warm_up():
+    """Загружает расписание и продолжает рассылки в фоне, пока бот уже отвечает на обновления"""
+    # Независимо друг от друга: ошибка загрузки расписания не должна оставить рассылки стоять
+    results = await asyncio.gather(
+        scheduler.warm_up(CATCH_UP_SECONDS),
+        resume_broadcasts(),
+        return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error("Startup task failed", exc_info=result)
+
+async def post_init(application):
+    """Выполняется после запуска event loop, до начала обработки обновлений"""
+    global warm_up_task
+    scheduler.start()
+    warm_up_task = asyncio.create_task(warm_up())
+    loop = asyncio.get_running_loop()
+    # kill -HUP <pid> перечитывает расписание из базы без перезапуска
+    if hasattr(signal, 'SIGHUP'):
+        loop.add_signal_handler(signal.SIGHUP, scheduler.request_reload)
+    # kill -USR1 <pid> включает/выключает профилирование без перезапуска.
+    # Через event loop, а не signal.signal: обработчик пишет в лог и не должен
+    # прерывать поток внутри RateLimitFilter, который держит блокировку
+    if hasattr(signal, 'SIGUSR1'):
+        loop.add_signal_handler(signal.SIGUSR1, profiler.toggle)
+
+async def post_stop(application):
+    """Выполняется при остановке бота (SIGTERM/SIGINT), пока event loop еще работает"""
+    if warm_up_task is not None and not warm_up_task.done():
+        warm_up_task.cancel()
+    # Рассылки сохраняют позицию и продолжатся после запуска
+    if broadcaster is not None:
+        await broadcaster.stop()
+    # Новые напоминания не начинаются, начатые дорабатывают
+    await scheduler.shutdown(SHUTDOWN_TIMEOUT)
+    # Сохраняем профили, накопленные с последнего сброса
+    await asyncio.to_thread(profile_writer.flush)
+    # Актуальный снимок расписания: следующий запуск не будет читать все лекарства из базы
+    await asyncio.to_thread(scheduler.save_snapshot)
+
 def main():
     """Основная функция запуска бота"""
-    application = Application.builder().token(BOT_TOKEN).build()
+    global db, profile_writer, scheduler
+    db = Database(DB_PATH)
+    profile_writer = ProfileWriter(db)
+    scheduler = MedicationScheduler(BOT_TOKEN, db, base_url=TELEGRAM_API_URL, snapshot_path=SCHEDULE_SNAPSHOT_PATH)
+    
+    builder = Application.builder().token(BOT_TOKEN).post_init(post_init).post_stop(post_stop)
+    if TELEGRAM_API_URL:
+        builder = builder.base_url(TELEGRAM_API_URL)
+    application = builder.build()
     
     # Обработчики кнопок
     application.add_handler(CallbackQueryHandler(button_handler))
@@ -436,12 +762,27 @@ def main():
     # Обработчик всех текстовых сообщений
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
     
+    # Подсказки названий лекарств в inline-режиме (включается в @BotFather: /setinline)
+    application.add_handler(InlineQueryHandler(inline_medication_name))
+    
     # Команды
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("help", help_command))
-    
-    # Запускаем планировщик напоминаний
-    scheduler.start()
+    application.add_handler(CommandHandler("profile", profile_command))
+    application.add_handler(CommandHandler("backup", backup_command))
+    application.add_handler(CommandHandler("broadcast", broadcast_command))
+    application.add_handler(CommandHandler("reload", reload_command))
+    application.add_handler(CommandHandler("export", export_command))
+    
+    # Служебные задания; планировщик запускается в post_init, расписание загружается в фоне
+    scheduler.add_interval_job(profile_writer.flush, PROFILE_FLUSH_INTERVAL, 'flush_profiles')
+    scheduler.add_interval_job(archive_and_compact, 24 * 3600, 'archive_and_compact')
+    if BACKUP_INTERVAL_HOURS > 0:
+        scheduler.add_interval_job(run_backup, BACKUP_INTERVAL_HOURS * 3600, 'backup')
+    
+    # Эндпоинт метрик
+    if METRICS_PORT:
+        start_metrics_server(int(METRICS_PORT))
     
     # Запускаем бота
     logger.info("Бот запускается...")
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import time
+from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError
+
+logger = logging.getLogger(__name__)
+
+# Порядок счетчиков в counts
+OUTCOMES = ('delivered', 'failed', 'blocked')
+
+
+class RateLimiter:
+    """Ограничитель частоты (token bucket) для асинхронного кода"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class Broadcaster:
+    """Рассылка сообщения всем пользователям бота.
+
+    Получатели читаются из таблицы users порциями по возрастанию user_id,
+    отправка идет через RateLimiter, а прогресс периодически сохраняется в
+    таблицу broadcasts, поэтому после перезапуска рассылка продолжается с
+    последней контрольной точки. Пока планировщик рассылает напоминания,
+    рассылка ждет.
+    """
+
+    def __init__(self, db, scheduler, rate=20, chunk_size=500, checkpoint_every=100):
+        self.db = db
+        self.scheduler = scheduler
+        self.limiter = RateLimiter(rate)
+        self.chunk_size = chunk_size
+        self.checkpoint_every = checkpoint_every
+        self._tasks = set()
+
+    @property
+    def bot(self):
+        return self.scheduler.bot
+
+    def start(self, text, admin_id):
+        """Создает рассылку и запускает ее в фоне; возвращает id рассылки"""
+        broadcast_id = self.db.create_broadcast(text, admin_id)
+        self._spawn(broadcast_id, text, admin_id, 0, [0, 0, 0])
+        return broadcast_id
+
+    def resume(self, broadcasts):
+        """Продолжает рассылки, прерванные перезапуском (строки db.get_unfinished_broadcasts())"""
+        for broadcast_id, text, admin_id, last_user_id, delivered, failed, blocked in broadcasts:
+            logger.info("Resuming broadcast %s after user %s", broadcast_id, last_user_id)
+            self._spawn(broadcast_id, text, admin_id, last_user_id, [delivered, failed, blocked])
+
+    async def stop(self):
+        """Останавливает рассылки; прогресс сохраняется в _run, после запуска они продолжатся"""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if tasks:
+            logger.info("Stopped %d broadcasts", len(tasks))
+
+    def _spawn(self, *args):
+        task = asyncio.create_task(self._run(*args))
+        # Держим ссылку на задачу, чтобы ее не собрал сборщик мусора
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, broadcast_id, text, admin_id, last_user_id, counts):
+        """counts - [доставлено, ошибок, заблокировали бота]"""
+        started = time.monotonic()
+        since_checkpoint = 0
+        try:
+            for chunk in self.db.iter_user_ids(last_user_id, self.chunk_size):
+                for user_id in chunk:
+                    counts[OUTCOMES.index(await self._send(user_id, text))] += 1
+                    last_user_id = user_id
+                    since_checkpoint += 1
+                    if since_checkpoint >= self.checkpoint_every:
+                        self.db.save_broadcast_progress(broadcast_id, last_user_id, *counts)
+                        since_checkpoint = 0
+        except asyncio.CancelledError:
+            # Остановка бота: сохраняем позицию, рассылка продолжится после запуска
+            self.db.save_broadcast_progress(broadcast_id, last_user_id, *counts)
+            raise
+
+        self.db.save_broadcast_progress(broadcast_id, last_user_id, *counts, status='done')
+        delivered, failed, blocked = counts
+        logger.info("Broadcast %s finished in %.0f s: delivered=%d failed=%d blocked=%d",
+                    broadcast_id, time.monotonic() - started, delivered, failed, blocked)
+        await self._report(broadcast_id, admin_id, counts)
+
+    async def _send(self, user_id, text):
+        """Отправляет одно сообщение; возвращает 'delivered', 'failed' или 'blocked'"""
+        while True:
+            # Напоминания важнее рассылки
+            while self.scheduler.dispatching:
+                await asyncio.sleep(0.5)
+            await self.limiter.acquire()
+            try:
+                await self.bot.send_message(chat_id=user_id, text=text)
+                return 'delivered'
+            except RetryAfter as e:
+                logger.warning("Broadcast rate limited, sleeping %s s", e.retry_after)
+                await asyncio.sleep(e.retry_after)
+            except Forbidden:
+                return 'blocked'
+            except BadRequest as e:
+                # Например, "Chat not found" для удаленного аккаунта
+                logger.debug("Broadcast to %s failed: %s", user_id, e)
+                return 'failed'
+            except TelegramError as e:
+                logger.warning("Broadcast to %s failed: %s", user_id, e)
+                return 'failed'
+
+    async def _report(self, broadcast_id, admin_id, counts):
+        if not admin_id:
+            return
+        delivered, failed, blocked = counts
+        try:
+            await self.bot.send_message(
+                chat_id=admin_id,
+                text=(
+                    f"📣 Рассылка #{broadcast_id} завершена\n\n"
+                    f"✅ Доставлено: {delivered}\n"
+                    f"🚫 Заблокировали бота: {blocked}\n"
+                    f"❌ Ошибок: {failed}"
+                )
+            )
+        except TelegramError as e:
+            logger.error("Cannot send broadcast report to %s: %s", admin_id, e)
@@ -1,7 +1,9 @@
 import sqlite3
 import logging
 import os
-from datetime import datetime
+import time
+from datetime import datetime, timezone
+from metrics import track_query
 
 logger = logging.getLogger(__name__)
 
@@ -16,11 +18,26 @@ class Database:
         """Создает соединение с базой данных"""
         return sqlite3.connect(self.db_path)
     
+    @track_query('create_tables')
     def create_tables(self):
         """Создает таблицы если они не существуют"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
+        # Инкрементальный vacuum: место от архивированных строк возвращается порциями.
+        # Для новой базы режим задается до создания таблиц; существующую базу
+        # переводит полный VACUUM, который запускается отдельно (enable_incremental_vacuum)
+        if cursor.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()[0] == 0:
+            cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        elif cursor.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            logger.warning(
+                "База данных не в режиме auto_vacuum=INCREMENTAL, место от архива не возвращается. "
+                "Остановите бота и выполните: python database.py enable-incremental-vacuum"
+            )
+        
+        # WAL: читатели (в том числе онлайн-бэкап) не блокируют запись
+        cursor.execute('PRAGMA journal_mode=WAL')
+        
         # Таблица пользователей
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS users (
@@ -28,10 +45,16 @@ class Database:
                 username TEXT,
                 first_name TEXT,
                 last_name TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_seen_at TIMESTAMP
             )
         ''')
         
+        # Миграция баз, созданных до появления last_seen_at
+        user_columns = {row[1] for row in cursor.execute('PRAGMA table_info(users)')}
+        if 'last_seen_at' not in user_columns:
+            cursor.execute('ALTER TABLE users ADD COLUMN last_seen_at TIMESTAMP')
+        
         # Таблица лекарств
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS medications (
@@ -42,28 +65,149 @@ class Database:
                 schedule TEXT NOT NULL,
                 is_active BOOLEAN DEFAULT TRUE,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                deactivated_at TIMESTAMP,
                 FOREIGN KEY (user_id) REFERENCES users (user_id)
             )
         ''')
         
+        medication_columns = {row[1] for row in cursor.execute('PRAGMA table_info(medications)')}
+        if 'deactivated_at' not in medication_columns:
+            cursor.execute('ALTER TABLE medications ADD COLUMN deactivated_at TIMESTAMP')
+        
+        # Частичный индекс только по активным лекарствам: не растет вместе с историей
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_medications_active_user
+            ON medications (user_id, created_at)
+            WHERE is_active = TRUE
+        ''')
+        
+        # Архив давно удаленных лекарств и их истории приемов
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS medications_archive (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                dosage TEXT,
+                schedule TEXT NOT NULL,
+                created_at TIMESTAMP,
+                deactivated_at TIMESTAMP,
+                archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_medications_archive_user ON medications_archive (user_id)')
+        
+        # История подтвержденных приемов
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS intakes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                medication_id INTEGER,
+                medication_name TEXT NOT NULL,
+                reminded_at TIMESTAMP,
+                taken_at TIMESTAMP NOT NULL,
+                delay_minutes INTEGER,
+                FOREIGN KEY (user_id) REFERENCES users (user_id)
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_intakes_user ON intakes (user_id, id)')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS intakes_archive (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                medication_id INTEGER,
+                medication_name TEXT NOT NULL,
+                reminded_at TIMESTAMP,
+                taken_at TIMESTAMP NOT NULL,
+                delay_minutes INTEGER,
+                archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_intakes_archive_user ON intakes_archive (user_id, id)')
+        
+        # Таблица рассылок (прогресс сохраняется, чтобы продолжить после перезапуска)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS broadcasts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                text TEXT NOT NULL,
+                created_by INTEGER,
+                last_user_id INTEGER DEFAULT 0,
+                delivered INTEGER DEFAULT 0,
+                failed INTEGER DEFAULT 0,
+                blocked INTEGER DEFAULT 0,
+                status TEXT DEFAULT 'running',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                finished_at TIMESTAMP
+            )
+        ''')
+        
+        # Служебные счетчики. schedule_version растет при любом изменении medications
+        # (в том числе ручном), по нему проверяется снимок расписания на диске
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        ''')
+        cursor.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('schedule_version', 0)")
+        # Только изменения, влияющие на расписание: архивирование неактивных строк снимок не сбрасывает.
+        # Триггеры пересоздаются, чтобы базы с прежними (безусловными) триггерами получили новые
+        schedule_triggers = {
+            'insert': 'AFTER INSERT ON medications',
+            'update': 'AFTER UPDATE OF user_id, name, dosage, schedule, is_active ON medications',
+            'delete': 'AFTER DELETE ON medications WHEN OLD.is_active',
+        }
+        for name, event in schedule_triggers.items():
+            cursor.execute(f'DROP TRIGGER IF EXISTS medications_schedule_version_{name}')
+            cursor.execute(f'''
+                CREATE TRIGGER medications_schedule_version_{name}
+                {event}
+                BEGIN
+                    UPDATE meta SET value = value + 1 WHERE key = 'schedule_version';
+                END
+            ''')
+        
         conn.commit()
         conn.close()
         logger.info("Таблицы базы данных созданы/проверены")
     
+    # UPSERT сохраняет created_at существующего пользователя
+    UPSERT_USER_SQL = '''
+        INSERT INTO users (user_id, username, first_name, last_name, last_seen_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET
+            username = excluded.username,
+            first_name = excluded.first_name,
+            last_name = excluded.last_name,
+            last_seen_at = excluded.last_seen_at
+    '''
+    
+    @track_query('add_user')
     def add_user(self, user_id, username, first_name, last_name):
         """Добавляет или обновляет пользователя"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('''
-            INSERT OR REPLACE INTO users (user_id, username, first_name, last_name)
-            VALUES (?, ?, ?, ?)
-        ''', (user_id, username, first_name, last_name))
+        last_seen_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        cursor.execute(self.UPSERT_USER_SQL, (user_id, username, first_name, last_name, last_seen_at))
         
         conn.commit()
         conn.close()
-        logger.info(f"Добавлен/обновлен пользователь: {user_id}")
+        logger.info("Добавлен/обновлен пользователь: %s", user_id)
+    
+    @track_query('upsert_users')
+    def upsert_users(self, users):
+        """Добавляет или обновляет пачку пользователей одной транзакцией.
+        users - список (user_id, username, first_name, last_name, last_seen_at)
+        """
+        conn = self.get_connection()
+        try:
+            with conn:
+                conn.executemany(self.UPSERT_USER_SQL, users)
+        finally:
+            conn.close()
+        logger.info("Сохранено профилей пользователей: %d", len(users))
     
+    @track_query('add_medication')
     def add_medication(self, user_id, name, dosage, schedule):
         """Добавляет новое лекарство"""
         conn = self.get_connection()
@@ -78,9 +222,10 @@ class Database:
         conn.commit()
         conn.close()
         
-        logger.info(f"Добавлено лекарство: {name} для пользователя {user_id}")
+        logger.info("Добавлено лекарство: %s для пользователя %s", name, user_id)
         return medication_id
     
+    @track_query('get_user_medications')
     def get_user_medications(self, user_id):
         """Возвращает все активные лекарства пользователя"""
         conn = self.get_connection()
@@ -98,13 +243,14 @@ class Database:
         
         return medications
     
+    @track_query('get_all_medications')
     def get_all_medications(self):
         """Возвращает все лекарства всех пользователей (для напоминаний)"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
-            SELECT user_id, name, dosage, schedule 
+            SELECT id, user_id, name, dosage, schedule 
             FROM medications 
             WHERE is_active = TRUE
         ''')
@@ -114,6 +260,51 @@ class Database:
         
         return medications
     
+    @track_query('get_schedule_version')
+    def get_schedule_version(self):
+        """Счетчик изменений таблицы medications"""
+        conn = self.get_connection()
+        row = conn.execute("SELECT value FROM meta WHERE key = 'schedule_version'").fetchone()
+        conn.close()
+        return row[0] if row else 0
+    
+    @track_query('get_versioned_medications')
+    def get_versioned_medications(self):
+        """Возвращает (schedule_version, строки get_all_medications), прочитанные в одной транзакции"""
+        conn = self.get_connection()
+        try:
+            conn.execute('BEGIN')
+            version = conn.execute("SELECT value FROM meta WHERE key = 'schedule_version'").fetchone()[0]
+            medications = conn.execute('''
+                SELECT id, user_id, name, dosage, schedule
+                FROM medications
+                WHERE is_active = TRUE
+            ''').fetchall()
+            conn.commit()
+        finally:
+            conn.close()
+        return version, medications
+    
+    @track_query('get_meta')
+    def get_meta(self, key):
+        """Значение служебного счетчика или None"""
+        conn = self.get_connection()
+        row = conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        conn.close()
+        return row[0] if row else None
+    
+    @track_query('advance_meta')
+    def advance_meta(self, key, value):
+        """Поднимает служебный счетчик до value; меньшее значение не записывается"""
+        conn = self.get_connection()
+        with conn:
+            conn.execute('''
+                INSERT INTO meta (key, value) VALUES (?, ?)
+                ON CONFLICT(key) DO UPDATE SET value = MAX(value, excluded.value)
+            ''', (key, value))
+        conn.close()
+    
+    @track_query('get_medications_by_time')
     def get_medications_by_time(self, time_str):
         """Возвращает лекарства которые нужно принять в указанное время"""
         conn = self.get_connection()
@@ -130,23 +321,26 @@ class Database:
         
         return medications
     
+    @track_query('delete_medication')
     def delete_medication(self, medication_id, user_id):
-        """Удаляет лекарство пользователя"""
+        """Удаляет лекарство пользователя (деактивирует, история сохраняется)"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
-            DELETE FROM medications 
-            WHERE id = ? AND user_id = ?
+            UPDATE medications 
+            SET is_active = FALSE, deactivated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND user_id = ? AND is_active = TRUE
         ''', (medication_id, user_id))
         
         deleted = cursor.rowcount > 0
         conn.commit()
         conn.close()
         
-        logger.info(f"Удаление лекарства {medication_id}: {deleted}")
+        logger.info("Удаление лекарства %s: %s", medication_id, deleted)
         return deleted
     
+    @track_query('get_medication')
     def get_medication(self, medication_id, user_id):
         """Возвращает конкретное лекарство"""
         conn = self.get_connection()
@@ -161,4 +355,233 @@ class Database:
         medication = cursor.fetchone()
         conn.close()
         
-        return medication
\ No newline at end of file
+        return medication
+    
+    def iter_user_ids(self, after_user_id=0, chunk_size=500):
+        """Порциями возвращает id пользователей больше after_user_id (по возрастанию).
+        Каждая порция читается отдельным коротким запросом, весь список в память не загружается.
+        """
+        while True:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT user_id 
+                FROM users 
+                WHERE user_id > ?
+                ORDER BY user_id
+                LIMIT ?
+            ''', (after_user_id, chunk_size))
+            chunk = [row[0] for row in cursor]
+            conn.close()
+            
+            if not chunk:
+                return
+            yield chunk
+            after_user_id = chunk[-1]
+    
+    @track_query('create_broadcast')
+    def create_broadcast(self, text, created_by):
+        """Создает рассылку и возвращает ее id"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT INTO broadcasts (text, created_by)
+            VALUES (?, ?)
+        ''', (text, created_by))
+        
+        broadcast_id = cursor.lastrowid
+        conn.commit()
+        conn.close()
+        
+        logger.info("Создана рассылка %s", broadcast_id)
+        return broadcast_id
+    
+    @track_query('save_broadcast_progress')
+    def save_broadcast_progress(self, broadcast_id, last_user_id, delivered, failed, blocked, status='running'):
+        """Сохраняет контрольную точку рассылки"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            UPDATE broadcasts 
+            SET last_user_id = ?, delivered = ?, failed = ?, blocked = ?, status = ?,
+                finished_at = CASE WHEN ? = 'running' THEN NULL ELSE CURRENT_TIMESTAMP END
+            WHERE id = ?
+        ''', (last_user_id, delivered, failed, blocked, status, status, broadcast_id))
+        
+        conn.commit()
+        conn.close()
+    
+    @track_query('get_unfinished_broadcasts')
+    def get_unfinished_broadcasts(self):
+        """Возвращает незавершенные рассылки"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT id, text, created_by, last_user_id, delivered, failed, blocked 
+            FROM broadcasts 
+            WHERE status = 'running'
+            ORDER BY id
+        ''')
+        
+        broadcasts = cursor.fetchall()
+        conn.close()
+        
+        return broadcasts
+    
+    @track_query('add_intake')
+    def add_intake(self, user_id, medication_id, medication_name, reminded_at, taken_at):
+        """Сохраняет подтвержденный прием; reminded_at и taken_at - unix-время"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT INTO intakes (user_id, medication_id, medication_name, reminded_at, taken_at, delay_minutes)
+            VALUES (?, ?, ?, datetime(?, 'unixepoch'), datetime(?, 'unixepoch'), ?)
+        ''', (user_id, medication_id, medication_name, reminded_at, taken_at, (taken_at - reminded_at) // 60))
+        
+        conn.commit()
+        conn.close()
+    
+    def _iter_chunks(self, query, params, chunk_size):
+        """Читает результат запроса порциями fetchmany, не загружая его целиком"""
+        conn = self.get_connection()
+        try:
+            cursor = conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            conn.close()
+    
+    def iter_user_medication_history(self, user_id, chunk_size=500):
+        """Порциями возвращает все лекарства пользователя, включая неактивные и архивные"""
+        return self._iter_chunks('''
+            SELECT id, name, dosage, schedule, is_active, created_at 
+            FROM medications 
+            WHERE user_id = ?
+            UNION ALL
+            SELECT id, name, dosage, schedule, FALSE, created_at 
+            FROM medications_archive 
+            WHERE user_id = ?
+            ORDER BY id
+        ''', (user_id, user_id), chunk_size)
+    
+    def iter_user_intakes(self, user_id, chunk_size=500):
+        """Порциями возвращает историю приемов пользователя (от старых к новым), включая архив"""
+        return self._iter_chunks('''
+            SELECT i.medication_name, COALESCE(m.dosage, ma.dosage), i.reminded_at, i.taken_at, i.delay_minutes 
+            FROM (
+                SELECT id, medication_id, medication_name, reminded_at, taken_at, delay_minutes 
+                FROM intakes WHERE user_id = ?
+                UNION ALL
+                SELECT id, medication_id, medication_name, reminded_at, taken_at, delay_minutes 
+                FROM intakes_archive WHERE user_id = ?
+            ) i
+            LEFT JOIN medications m ON m.id = i.medication_id AND m.user_id = ?
+            LEFT JOIN medications_archive ma ON ma.id = i.medication_id AND ma.user_id = ?
+            ORDER BY i.id
+        ''', (user_id, user_id, user_id, user_id), chunk_size)
+    
+    @track_query('archive_inactive_medications')
+    def archive_inactive_medications(self, older_than_days=180, batch_size=500):
+        """Переносит лекарства, удаленные больше older_than_days дней назад, и их приемы в архив.
+        Работает небольшими транзакциями по batch_size лекарств; возвращает число перенесенных.
+        """
+        archived = 0
+        conn = self.get_connection()
+        try:
+            while True:
+                with conn:
+                    ids = [row[0] for row in conn.execute('''
+                        SELECT id 
+                        FROM medications 
+                        WHERE is_active = FALSE AND deactivated_at < datetime('now', ?)
+                        LIMIT ?
+                    ''', (f'-{int(older_than_days)} days', batch_size))]
+                    if not ids:
+                        break
+                    
+                    placeholders = ','.join('?' * len(ids))
+                    conn.execute(f'''
+                        INSERT OR REPLACE INTO intakes_archive 
+                            (id, user_id, medication_id, medication_name, reminded_at, taken_at, delay_minutes)
+                        SELECT id, user_id, medication_id, medication_name, reminded_at, taken_at, delay_minutes 
+                        FROM intakes WHERE medication_id IN ({placeholders})
+                    ''', ids)
+                    conn.execute(f'DELETE FROM intakes WHERE medication_id IN ({placeholders})', ids)
+                    conn.execute(f'''
+                        INSERT OR REPLACE INTO medications_archive 
+                            (id, user_id, name, dosage, schedule, created_at, deactivated_at)
+                        SELECT id, user_id, name, dosage, schedule, created_at, deactivated_at 
+                        FROM medications WHERE id IN ({placeholders})
+                    ''', ids)
+                    conn.execute(f'DELETE FROM medications WHERE id IN ({placeholders})', ids)
+                archived += len(ids)
+        finally:
+            conn.close()
+        
+        if archived:
+            logger.info("В архив перенесено лекарств: %d", archived)
+        return archived
+    
+    @track_query('enable_incremental_vacuum')
+    def enable_incremental_vacuum(self):
+        """Переводит существующую базу в режим auto_vacuum=INCREMENTAL.
+        Полный VACUUM переписывает весь файл и требует столько же свободного места,
+        поэтому выполняется вручную при остановленном боте. Возвращает False, если режим уже включен.
+        """
+        conn = self.get_connection()
+        try:
+            if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+                return False
+            started = time.monotonic()
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.execute('VACUUM')
+        finally:
+            conn.close()
+        
+        logger.info("База данных переведена в режим auto_vacuum=INCREMENTAL за %.1f с", time.monotonic() - started)
+        return True
+    
+    @track_query('incremental_vacuum')
+    def incremental_vacuum(self, pages=1000):
+        """Возвращает файловой системе до pages свободных страниц"""
+        conn = self.get_connection()
+        try:
+            free_before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            conn.execute(f'PRAGMA incremental_vacuum({int(pages)})').fetchall()
+            free_after = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        finally:
+            conn.close()
+        
+        logger.info("Incremental vacuum: освобождено страниц %d", free_before - free_after)
+        return free_before - free_after
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Medication bot database maintenance')
+    parser.add_argument('--db', default=os.getenv('DB_PATH', '/app/data/medications.db'))
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser(
+        'enable-incremental-vacuum',
+        help='convert the database to auto_vacuum=INCREMENTAL (full VACUUM, stop the bot first)'
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    db = Database(args.db)
+
+    if args.command == 'enable-incremental-vacuum':
+        if not db.enable_incremental_vacuum():
+            print("auto_vacuum=INCREMENTAL is already enabled")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+import bisect
+import difflib
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DICTIONARY_PATH = os.path.join('assets', 'drugs.txt')
+
+
+def normalize(text):
+    """Ключ для поиска: без регистра, ё -> е, лишние пробелы схлопнуты"""
+    return ' '.join(text.casefold().replace('ё', 'е').split())
+
+
+class DrugIndex:
+    """Префиксный индекс названий лекарств из локального словаря.
+
+    Словарь загружается при первом обращении. Названия хранятся в списке,
+    отсортированном по нормализованному ключу, поиск по префиксу - bisect.
+    Если по префиксу ничего не нашлось, ищутся похожие названия (опечатки)
+    среди названий на ту же букву.
+    """
+
+    def __init__(self, path=DEFAULT_DICTIONARY_PATH):
+        self.path = path
+        self._names = None
+        self._keys = None
+        # первая буква ключа -> список ключей (кандидаты для поиска опечаток)
+        self._by_first_letter = None
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        if self._keys is not None:
+            return
+        with self._lock:
+            if self._keys is not None:
+                return
+            started = time.perf_counter()
+            entries = {}
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    for line in f:
+                        name = line.strip()
+                        if name and not name.startswith('#'):
+                            entries.setdefault(normalize(name), name)
+            except OSError as e:
+                logger.error("Cannot load drug dictionary %s: %s", self.path, e)
+
+            keys = sorted(entries)
+            by_first_letter = {}
+            for key in keys:
+                by_first_letter.setdefault(key[0], []).append(key)
+
+            self._names = [entries[key] for key in keys]
+            self._by_first_letter = by_first_letter
+            self._keys = keys
+            logger.info("Drug dictionary loaded: %d names in %.1f ms",
+                        len(keys), (time.perf_counter() - started) * 1000)
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self._keys)
+
+    def name_at(self, position):
+        """Название по номеру в индексе (для callback_data кнопок)"""
+        self._ensure_loaded()
+        if 0 <= position < len(self._names):
+            return self._names[position]
+        return None
+
+    def find(self, text):
+        """Номер названия, точно совпадающего с text (без учета регистра), или None"""
+        self._ensure_loaded()
+        key = normalize(text)
+        position = bisect.bisect_left(self._keys, key)
+        if position < len(self._keys) and self._keys[position] == key:
+            return position
+        return None
+
+    def complete(self, prefix, limit=5):
+        """Номера названий, начинающихся с prefix"""
+        self._ensure_loaded()
+        key = normalize(prefix)
+        if not key:
+            return []
+        keys = self._keys
+        position = bisect.bisect_left(keys, key)
+        matches = []
+        while position < len(keys) and len(matches) < limit and keys[position].startswith(key):
+            matches.append(position)
+            position += 1
+        return matches
+
+    def suggest(self, text, limit=5, cutoff=0.7):
+        """Номера подходящих названий: сначала по префиксу, затем с учетом опечаток"""
+        matches = self.complete(text, limit)
+        if len(matches) >= limit:
+            return matches
+        key = normalize(text)
+        if not key:
+            return matches
+        candidates = self._by_first_letter.get(key[0], ())
+        for close in difflib.get_close_matches(key, candidates, n=limit, cutoff=cutoff):
+            position = bisect.bisect_left(self._keys, close)
+            if position not in matches:
+                matches.append(position)
+            if len(matches) >= limit:
+                break
+        return matches
+
+
+drug_index = DrugIndex()
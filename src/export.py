@@ -0,0 +1,86 @@
+import csv
+import io
+import tempfile
+import zipfile
+from datetime import datetime, timezone
+
+# До этого размера файл экспорта держится в памяти, дальше - во временном файле на диске.
+# Это ограничивает память только при сборке: при отправке python-telegram-bot читает файл целиком
+SPOOL_MAX_SIZE = 1024 * 1024
+# Предел размера файла, загружаемого ботом через Bot API
+MAX_UPLOAD_SIZE = 50 * 1024 * 1024
+
+MEDICATION_HEADER = ('Лекарство', 'Дозировка', 'Расписание', 'Активно', 'Добавлено')
+INTAKE_HEADER = ('Лекарство', 'Дозировка', 'Напоминание', 'Принято', 'Задержка (мин)')
+
+
+def _local_time(timestamp, tz):
+    """'YYYY-MM-DD HH:MM:SS' (UTC, как хранит SQLite) -> местное время"""
+    if not timestamp:
+        return ''
+    moment = datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+    return moment.astimezone(tz).strftime('%Y-%m-%d %H:%M')
+
+
+def medication_rows(db, user_id, tz):
+    """Строки CSV со всеми лекарствами пользователя"""
+    yield MEDICATION_HEADER
+    for chunk in db.iter_user_medication_history(user_id):
+        for medication_id, name, dosage, schedule, is_active, created_at in chunk:
+            yield name, dosage, schedule, 'да' if is_active else 'нет', _local_time(created_at, tz)
+
+
+def intake_rows(db, user_id, tz):
+    """Строки CSV с историей подтвержденных приемов"""
+    yield INTAKE_HEADER
+    for chunk in db.iter_user_intakes(user_id):
+        for name, dosage, reminded_at, taken_at, delay_minutes in chunk:
+            yield name, dosage or '', _local_time(reminded_at, tz), _local_time(taken_at, tz), delay_minutes
+
+
+def _write_csv(binary_file, rows):
+    # utf-8-sig: Excel правильно открывает кириллицу
+    text = io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+    csv.writer(text, delimiter=';').writerows(rows)
+    text.flush()
+    # Отсоединяем обертку, чтобы она не закрыла исходный файл
+    text.detach()
+
+
+def export_csv(rows):
+    """Пишет строки в SpooledTemporaryFile и возвращает его, перемотанным в начало"""
+    buffer = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    _write_csv(buffer, rows)
+    buffer.seek(0)
+    return buffer
+
+
+def export_zip(files):
+    """files - список (имя файла, строки); возвращает ZIP-архив в SpooledTemporaryFile"""
+    buffer = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, rows in files:
+            with archive.open(name, 'w') as member:
+                _write_csv(member, rows)
+    buffer.seek(0)
+    return buffer
+
+
+def file_size(buffer):
+    """Размер файлового объекта; позиция возвращается в начало"""
+    size = buffer.seek(0, io.SEEK_END)
+    buffer.seek(0)
+    return size
+
+
+def build_user_export(db, user_id, tz, compress=False):
+    """Готовит экспорт пользователя.
+    Возвращает список (имя файла, файловый объект): два CSV или один ZIP.
+    """
+    files = [
+        ('medications.csv', medication_rows(db, user_id, tz)),
+        ('intakes.csv', intake_rows(db, user_id, tz)),
+    ]
+    if compress:
+        return [('medication_history.zip', export_zip(files))]
+    return [(name, export_csv(rows)) for name, rows in files]
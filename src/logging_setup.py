@@ -0,0 +1,71 @@
+import atexit
+import logging
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class RateLimitFilter(logging.Filter):
+    """Ограничивает число записей с одного места вызова.
+
+    С каждой строки кода (pathname:lineno) пропускается не более burst
+    записей за interval секунд. Отброшенные записи подсчитываются, и первая
+    запись следующего окна дополняется сводкой о пропущенных.
+    """
+
+    def __init__(self, burst=20, interval=10.0):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        # (pathname, lineno) -> [начало окна, пропущено в окне, отброшено в окне]
+        self._sites = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.pathname, record.lineno)
+        now = record.created
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.interval:
+                suppressed = site[2] if site is not None else 0
+                self._sites[key] = [now, 1, 0]
+                if suppressed:
+                    window = now - site[0]
+                    record.msg = f"{record.msg} [suppressed {suppressed} similar messages in last {window:.0f}s]"
+                return True
+            if site[1] < self.burst:
+                site[1] += 1
+                return True
+            site[2] += 1
+            return False
+
+
+def setup_logging(level=logging.INFO, burst=20, interval=10.0):
+    """Настраивает неблокирующее логирование.
+
+    Форматирование (подстановка аргументов, текст исключения) выполняется в
+    потоке вызова: QueueHandler.prepare() сохраняет в очереди готовое
+    сообщение, пока аргументы не изменились. Фоновому потоку QueueListener
+    достается только запись в поток вывода, поэтому event loop не ждет
+    ввода-вывода.
+    """
+    log_queue = queue.SimpleQueue()
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter(burst=burst, interval=interval))
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(level)
+
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    # Дописываем оставшиеся в очереди записи при выходе
+    atexit.register(listener.stop)
+    return listener
+
@@ -0,0 +1,239 @@
+import asyncio
+import bisect
+import functools
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from profiling import record_span
+
+logger = logging.getLogger(__name__)
+
+# Границы бакетов по умолчанию (в секундах)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    """Форматирует метки в виде {a="1",b="2"}"""
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    )
+    return "{" + body + "}"
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Монотонно растущий счетчик"""
+
+    type_name = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labelvalues, value in items:
+            yield self.name, _format_labels(self.labelnames, labelvalues), value
+
+
+class Gauge:
+    """Текущее значение; может вычисляться функцией в момент сбора"""
+
+    type_name = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._function = None
+        self._lock = threading.Lock()
+
+    def set(self, value, *labelvalues):
+        with self._lock:
+            self._values[labelvalues] = value
+
+    def set_function(self, function):
+        """Значение будет вычисляться вызовом function() при каждом сборе"""
+        self._function = function
+
+    def samples(self):
+        if self._function is not None:
+            try:
+                yield self.name, "", self._function()
+            except Exception as e:
+                logger.warning("Metric %s callback failed: %s", self.name, e)
+            return
+        with self._lock:
+            items = list(self._values.items())
+        for labelvalues, value in items:
+            yield self.name, _format_labels(self.labelnames, labelvalues), value
+
+
+class Histogram:
+    """Гистограмма с фиксированными бакетами"""
+
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labelvalues -> [счетчики по бакетам (+Inf последним), сумма]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labelvalues)
+            if state is None:
+                state = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(labelvalues, list(counts), total) for labelvalues, (counts, total) in self._values.items()]
+        for labelvalues, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, labelvalues, ('le', _format_value(bound)))
+                yield self.name + "_bucket", labels, cumulative
+            labels = _format_labels(self.labelnames, labelvalues)
+            yield self.name + "_sum", labels, total
+            yield self.name + "_count", labels, cumulative
+
+
+class Registry:
+    """Набор метрик, отдаваемых в текстовом формате Prometheus"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REMINDER_LAG = REGISTRY.register(Histogram(
+    'reminder_dispatch_lag_seconds',
+    'Delay between the scheduled reminder time and the moment it was sent',
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+))
+DB_QUERY_LATENCY = REGISTRY.register(Histogram(
+    'db_query_duration_seconds',
+    'Latency of Database methods',
+    labelnames=('query',)
+))
+HANDLER_LATENCY = REGISTRY.register(Histogram(
+    'handler_duration_seconds',
+    'Latency of Telegram update handlers',
+    labelnames=('handler',)
+))
+SEND_ERRORS = REGISTRY.register(Counter(
+    'reminder_send_errors_total',
+    'Reminder send failures by exception type',
+    labelnames=('error',)
+))
+SCHEDULER_JOBS = REGISTRY.register(Gauge(
+    'scheduler_jobs',
+    'Number of jobs currently registered in the scheduler'
+))
+
+
+def track_query(name):
+    """Декоратор: замеряет время выполнения метода Database"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                DB_QUERY_LATENCY.observe(elapsed, name)
+                record_span(name, elapsed)
+        return wrapper
+    return decorator
+
+
+def track_handler(name):
+    """Декоратор: замеряет время выполнения асинхронного обработчика"""
+    def decorator(func):
+        if not asyncio.iscoroutinefunction(func):
+            raise TypeError(f"track_handler expects a coroutine function, got {func!r}")
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                HANDLER_LATENCY.observe(time.perf_counter() - started, name)
+        return wrapper
+    return decorator
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Не засоряем лог каждым запросом Prometheus
+        pass
+
+
+def start_metrics_server(port, host='0.0.0.0'):
+    """Запускает HTTP-сервер /metrics в фоновом потоке"""
+    server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True)
+    thread.start()
+    logger.info("Metrics endpoint listening on %s:%d/metrics", host, port)
+    return server
@@ -0,0 +1,71 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+
+class ProfileWriter:
+    """Запись профилей пользователей с пропуском неизменившихся данных.
+
+    Хранит ограниченный LRU-дайджест известных профилей (user_id ->
+    username, first_name, last_name и время последней записи). Повторный
+    /start с теми же данными не пишет в БД, пока не истек touch_interval
+    (тогда обновляется last_seen_at). Изменения копятся в памяти и
+    сохраняются пачкой одной транзакцией при вызове flush().
+    """
+
+    def __init__(self, db, max_entries=100_000, touch_interval=3600):
+        self.db = db
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        # user_id -> ((username, first_name, last_name), время последней записи)
+        self._digest = OrderedDict()
+        # user_id -> (username, first_name, last_name, время обращения)
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def record(self, user_id, username, first_name, last_name):
+        """Отмечает обращение пользователя; возвращает True, если нужна запись в БД"""
+        profile = (username, first_name, last_name)
+        now = time.time()
+        with self._lock:
+            known = self._digest.get(user_id)
+            if known is not None:
+                self._digest.move_to_end(user_id)
+                if known[0] == profile and now - known[1] < self.touch_interval:
+                    return False
+            self._pending[user_id] = profile + (now,)
+            return True
+
+    def flush(self):
+        """Сохраняет накопленные изменения одной транзакцией; возвращает число записей"""
+        with self._lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, {}
+
+        rows = [
+            (user_id, username, first_name, last_name,
+             datetime.fromtimestamp(seen_at, timezone.utc).strftime('%Y-%m-%d %H:%M:%S'))
+            for user_id, (username, first_name, last_name, seen_at) in pending.items()
+        ]
+        try:
+            self.db.upsert_users(rows)
+        except Exception as e:
+            logger.error("Error flushing %d user profiles: %s", len(rows), e)
+            with self._lock:
+                # Возвращаем в очередь, не затирая более свежие обращения
+                for user_id, entry in pending.items():
+                    self._pending.setdefault(user_id, entry)
+            return 0
+
+        with self._lock:
+            for user_id, (username, first_name, last_name, seen_at) in pending.items():
+                self._digest[user_id] = ((username, first_name, last_name), seen_at)
+                self._digest.move_to_end(user_id)
+            while len(self._digest) > self.max_entries:
+                self._digest.popitem(last=False)
+        return len(rows)
@@ -0,0 +1,149 @@
+import asyncio
+import contextvars
+import functools
+import hashlib
+import logging
+import os
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+# Список (name, seconds) для текущего профилируемого обновления
+_current_trace = contextvars.ContextVar('profiling_trace', default=None)
+
+
+def record_span(name, seconds):
+    """Добавляет отрезок (например, запрос к БД) в трассировку текущего обновления"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.append((name, seconds))
+
+
+def user_hash(user_id):
+    """Короткий необратимый идентификатор пользователя для имен файлов"""
+    if user_id is None:
+        return 'anonymous'
+    return hashlib.sha256(str(user_id).encode()).hexdigest()[:12]
+
+
+def _update_user_id(args):
+    """Достает id пользователя из Update среди аргументов обработчика"""
+    for arg in args:
+        user = getattr(arg, 'effective_user', None)
+        if user is not None:
+            return user.id
+    return None
+
+
+class UpdateProfiler:
+    """Выборочное профилирование обработчиков и задач планировщика.
+
+    Когда профилирование выключено, обертка стоит одну проверку флага.
+    Когда включено - доля sample_rate вызовов выполняется под cProfile,
+    а любой вызов дольше slow_threshold_ms сохраняется с легковесной
+    трассировкой (время выполнения и запросы к БД).
+    """
+
+    def __init__(self, directory, sample_rate=0.01, slow_threshold_ms=500, max_files=100, enabled=False):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold_ms / 1000
+        self.max_files = max_files
+        self.enabled = enabled
+        # cProfile глобален для потока - одновременно профилируем только один вызов
+        self._profiling_active = False
+
+    @classmethod
+    def from_env(cls):
+        """Создает профайлер из переменных окружения PROFILE_*"""
+        return cls(
+            directory=os.getenv('PROFILE_DIR', '/app/data/profiles'),
+            sample_rate=float(os.getenv('PROFILE_SAMPLE_RATE', '0.01')),
+            slow_threshold_ms=float(os.getenv('PROFILE_SLOW_MS', '500')),
+            max_files=int(os.getenv('PROFILE_MAX_FILES', '100')),
+            enabled=os.getenv('PROFILE_ENABLED', '').lower() in ('1', 'true', 'yes'),
+        )
+
+    def toggle(self):
+        """Переключает профилирование; возвращает новое состояние"""
+        self.enabled = not self.enabled
+        logger.info("Profiling %s", "enabled" if self.enabled else "disabled")
+        return self.enabled
+
+    def profiled(self, kind, get_user_id=_update_user_id):
+        """Декоратор асинхронного обработчика; get_user_id(args) возвращает id пользователя"""
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return await func(*args, **kwargs)
+                return await self._run(kind, get_user_id(args), func, args, kwargs)
+            return wrapper
+        return decorator
+
+    async def _run(self, kind, user_id, func, args, kwargs):
+        trace = []
+        token = _current_trace.set(trace)
+        profile = None
+        if not self._profiling_active and random.random() < self.sample_rate:
+            # Профиль включает и сопрограммы, выполнявшиеся во время await
+            self._profiling_active = True
+            # Импорт только при первом профилировании: по умолчанию оно выключено
+            import cProfile
+            profile = cProfile.Profile()
+            profile.enable()
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            if profile is not None:
+                profile.disable()
+                self._profiling_active = False
+            _current_trace.reset(token)
+            if profile is not None or elapsed >= self.slow_threshold:
+                self._dump_later(kind, user_id, elapsed, trace, profile)
+
+    def _dump_later(self, kind, user_id, elapsed, trace, profile):
+        """Сохраняет результаты в фоновом потоке, не блокируя event loop"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._dump(kind, user_id, elapsed, trace, profile)
+            return
+        loop.run_in_executor(None, self._dump, kind, user_id, elapsed, trace, profile)
+
+    def _dump(self, kind, user_id, elapsed, trace, profile):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            stamp = time.strftime('%Y%m%d-%H%M%S')
+            base = os.path.join(
+                self.directory,
+                f"{stamp}_{int(time.time() * 1000) % 1000:03d}_{kind}_{user_hash(user_id)}_{elapsed * 1000:.0f}ms"
+            )
+            if profile is not None:
+                profile.dump_stats(base + '.prof')
+            with open(base + '.trace.txt', 'w', encoding='utf-8') as f:
+                f.write(f"kind: {kind}\nuser: {user_hash(user_id)}\nelapsed_ms: {elapsed * 1000:.1f}\n")
+                f.write(f"profiled: {profile is not None}\n\n")
+                for name, seconds in trace:
+                    f.write(f"{seconds * 1000:9.2f} ms  {name}\n")
+            self._rotate()
+        except OSError as e:
+            logger.error("Cannot write profile to %s: %s", self.directory, e)
+
+    def _rotate(self):
+        """Оставляет не более max_files последних файлов"""
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.is_file()),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in entries[:max(0, len(entries) - self.max_files)]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+profiler = UpdateProfiler.from_env()
@@ -0,0 +1,128 @@
+import sys
+from array import array
+
+
+def parse_schedule(schedule):
+    """Преобразует расписание "08:00, 20:00" в кортеж минут от начала суток"""
+    minutes = []
+    for time_str in schedule.split(','):
+        time_str = time_str.strip()
+        if ':' not in time_str:
+            continue
+        hour, minute = map(int, time_str.split(':'))
+        if not (0 <= hour <= 23 and 0 <= minute <= 59):
+            raise ValueError(f"time out of range: {time_str}")
+        minutes.append(hour * 60 + minute)
+    return tuple(minutes)
+
+
+def format_minute(minute):
+    """Минуты от начала суток -> "ЧЧ:ММ\""""
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+class Medication:
+    """Компактное представление активного лекарства в планировщике"""
+
+    __slots__ = ('id', 'user_id', 'name', 'dosage', 'times')
+
+    def __init__(self, id, user_id, name, dosage, times):
+        self.id = id
+        self.user_id = user_id
+        # Одинаковые названия и дозировки у разных пользователей хранятся в одном экземпляре
+        self.name = sys.intern(name)
+        self.dosage = sys.intern(dosage) if dosage else ''
+        self.times = times
+
+    def __eq__(self, other):
+        if not isinstance(other, Medication):
+            return NotImplemented
+        return (self.id, self.user_id, self.name, self.dosage, self.times) == \
+            (other.id, other.user_id, other.name, other.dosage, other.times)
+
+    def __repr__(self):
+        return f"Medication(id={self.id}, user_id={self.user_id}, name={self.name!r}, times={self.times})"
+
+
+class ScheduleIndex:
+    """Расписание в памяти: лекарства по id и корзины id лекарств по минутам суток"""
+
+    def __init__(self):
+        self.medications = {}
+        # минута суток -> array('q') с id лекарств
+        self.buckets = {}
+
+    @classmethod
+    def from_rows(cls, rows, on_error=None):
+        """Строит индекс из строк (id, user_id, name, dosage, schedule)"""
+        index = cls()
+        for medication_id, user_id, name, dosage, schedule in rows:
+            try:
+                times = parse_schedule(schedule)
+            except ValueError as e:
+                if on_error is not None:
+                    on_error(medication_id, schedule, e)
+                continue
+            index.add(Medication(medication_id, user_id, name, dosage, times))
+        return index
+
+    @classmethod
+    def from_snapshot_rows(cls, rows):
+        """Строит индекс из строк снимка (id, user_id, name, dosage, [минуты]) без разбора расписаний"""
+        index = cls()
+        for medication_id, user_id, name, dosage, times in rows:
+            index.add(Medication(medication_id, user_id, name, dosage, tuple(times)))
+        return index
+
+    def snapshot_rows(self):
+        """Строки для снимка на диске (см. from_snapshot_rows)"""
+        return [
+            (medication.id, medication.user_id, medication.name, medication.dosage, medication.times)
+            for medication in self.medications.values()
+        ]
+
+    def add(self, medication):
+        self.medications[medication.id] = medication
+        for minute in medication.times:
+            bucket = self.buckets.get(minute)
+            if bucket is None:
+                bucket = self.buckets[minute] = array('q')
+            bucket.append(medication.id)
+
+    def remove(self, medication_id):
+        """Удаляет лекарство; возвращает минуты, корзины которых опустели"""
+        medication = self.medications.pop(medication_id, None)
+        emptied = []
+        if medication is None:
+            return emptied
+        for minute in medication.times:
+            bucket = self.buckets.get(minute)
+            if bucket is None:
+                continue
+            try:
+                bucket.remove(medication_id)
+            except ValueError:
+                pass
+            if not bucket:
+                del self.buckets[minute]
+                emptied.append(minute)
+        return emptied
+
+    def due(self, minute):
+        """Лекарства, прием которых назначен на эту минуту"""
+        bucket = self.buckets.get(minute, ())
+        medications = self.medications
+        return [medications[medication_id] for medication_id in bucket if medication_id in medications]
+
+    def minutes(self):
+        """Минуты суток, на которые есть хотя бы один прием"""
+        return self.buckets.keys()
+
+    def dose_count(self):
+        return sum(len(bucket) for bucket in self.buckets.values())
+
+    def __len__(self):
+        return len(self.medications)
+
+    def __contains__(self, medication_id):
+        return medication_id in self.medications
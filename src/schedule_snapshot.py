@@ -0,0 +1,42 @@
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Версия формата файла; при несовпадении снимок игнорируется
+SNAPSHOT_FORMAT = 1
+
+
+def save_snapshot(path, schedule_version, rows):
+    """Атомарно записывает строки ScheduleIndex.snapshot_rows() с версией расписания"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(
+            {'format': SNAPSHOT_FORMAT, 'schedule_version': schedule_version, 'medications': rows},
+            f, ensure_ascii=False, separators=(',', ':')
+        )
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path):
+    """Читает снимок; возвращает (schedule_version, строки) или None, если файла нет или он поврежден"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("Cannot read schedule snapshot %s: %s", path, e)
+        return None
+    if not isinstance(data, dict) or data.get('format') != SNAPSHOT_FORMAT:
+        logger.warning("Schedule snapshot %s has unsupported format", path)
+        return None
+    try:
+        return data['schedule_version'], data['medications']
+    except KeyError as e:
+        logger.warning("Schedule snapshot %s is missing %s", path, e)
+        return None
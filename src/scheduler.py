@@ -1,44 +1,101 @@
+import asyncio
 import logging
 import time
-import random
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.schedulers.base import STATE_RUNNING
 from apscheduler.triggers.cron import CronTrigger
 from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.request import HTTPXRequest
 import os
 from database import Database
 import pytz
-from datetime import datetime
+from datetime import datetime, timedelta
+from metrics import REMINDER_LAG, SEND_ERRORS, SCHEDULER_JOBS
+from profiling import profiler
+from schedule_model import Medication, ScheduleIndex, format_minute, parse_schedule
+from schedule_snapshot import load_snapshot, save_snapshot
+from templates import templates
 
 logger = logging.getLogger(__name__)
 
+# Сколько напоминаний может отправляться одновременно
+SEND_POOL_SIZE = 16
+# Префикс id заданий рассылки (по одному заданию на минуту суток с приемами)
+TICK_JOB_PREFIX = 'tick_'
+# Сколько секунд опоздавшее задание еще выполняется, а не пропускается
+MISFIRE_GRACE_SECONDS = 60
+# Ключ в таблице meta: время (unix), на которое была последняя рассылка напоминаний
+LAST_DISPATCH_KEY = 'last_dispatch_at'
+# Сколько секунд помнить разосланные минуты (с запасом больше окна досылки)
+DISPATCHED_MEMORY_SECONDS = 24 * 3600
+
 class MedicationScheduler:
-    def __init__(self, bot_token, db):
+    def __init__(self, bot_token, db, base_url=None, snapshot_path=None):
         self.bot_token = bot_token
         self.db = db
+        # Адрес Bot API (для локального тестового сервера), по умолчанию - api.telegram.org
+        self.base_url = base_url
+        self._bot = None
         # Указываем московский часовой пояс
-        self.scheduler = AsyncIOScheduler(timezone=pytz.timezone('Europe/Moscow'))
+        self.timezone = pytz.timezone('Europe/Moscow')
+        self.scheduler = AsyncIOScheduler(timezone=self.timezone)
+        self.index = ScheduleIndex()
+        # Выполняющиеся сейчас минутные рассылки напоминаний (ждем их при остановке)
+        self._dispatches = set()
+        # Начала уже разосланных минут (unix): досылка и задание не отправят минуту дважды
+        self._dispatched = set()
+        # После shutdown() новые рассылки не начинаются
+        self.stopping = False
+        # id лекарств, измененных обработчиками, пока reload/warm_up читает базу (иначе None)
+        self._touched = None
+        self._reload_lock = asyncio.Lock()
+        self._background_tasks = set()
+        # Снимок расписания на диске (ускоряет запуск) и версия расписания, с которой он записан
+        self.snapshot_path = snapshot_path
+        self._snapshot_version = None
+        SCHEDULER_JOBS.set_function(lambda: len(self.scheduler.get_jobs()))
+    
+    @property
+    def dispatching(self):
+        """Сколько минутных рассылок напоминаний выполняется прямо сейчас"""
+        return len(self._dispatches)
     
-    async def send_reminder(self, user_id, medication_name, dosage, time_str):
+    @property
+    def bot(self):
+        """Общий экземпляр Bot с пулом соединений для рассылки напоминаний"""
+        if self._bot is None:
+            kwargs = {'base_url': self.base_url} if self.base_url else {}
+            # pool_timeout=None: при пиковой рассылке задачи ждут свободное соединение, а не падают
+            request = HTTPXRequest(connection_pool_size=SEND_POOL_SIZE, pool_timeout=None)
+            self._bot = Bot(token=self.bot_token, request=request, **kwargs)
+        return self._bot
+    
+    @profiler.profiled('reminder', get_user_id=lambda args: args[1])
+    async def send_reminder(self, user_id, medication_name, dosage, time_str, medication_id=None):
         """Отправляет напоминание о приеме лекарства с кнопкой подтверждения"""
         try:
-            bot = Bot(token=self.bot_token)
+            bot = self.bot
             
-            reminder_text = f"""
-🔔 **Время принять лекарство!**
-
-💊 **Лекарство:** {medication_name}
-📋 **Дозировка:** {dosage}
-⏰ **Время:** {time_str}
-
-Нажми кнопку ниже когда примешь лекарство!
-            """
+            reminder_text = templates.render(
+                'reminder',
+                medication_name=medication_name,
+                dosage=dosage,
+                time_str=time_str
+            )
             
             # Добавляем время отправки уведомления в callback_data
             current_timestamp = int(time.time())
             
+            # По id лекарства: короче названия и всегда укладывается в 64 байта callback_data
+            if medication_id is not None:
+                callback_data = f"took_{medication_id}_{current_timestamp}"
+            else:
+                callback_data = f"taken_{medication_name}_{current_timestamp}"
+            
             # Создаем кнопку подтверждения
             keyboard = [
-                [InlineKeyboardButton("✅ Я принял(а) лекарство ✅", callback_data=f"taken_{medication_name}_{current_timestamp}")]
+                [InlineKeyboardButton("✅ Я принял(а) лекарство ✅", callback_data=callback_data)]
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
             
@@ -49,33 +106,68 @@ class MedicationScheduler:
                 parse_mode='Markdown'
             )
             
-            logger.info(f"Sent reminder to user {user_id} for {medication_name} at {current_timestamp}")
+            REMINDER_LAG.observe(self._dispatch_lag(time_str))
+            logger.info("Sent reminder to user %s for %s at %s", user_id, medication_name, current_timestamp)
             
         except Exception as e:
-            logger.error(f"Error sending reminder to {user_id}: {e}")
+            SEND_ERRORS.inc(type(e).__name__)
+            logger.error("Error sending reminder to %s: %s", user_id, e)
+    
+    def _dispatch_lag(self, time_str):
+        """Возвращает задержку отправки относительно запланированного времени (в секундах)"""
+        now = datetime.now(self.timezone)
+        hour, minute = map(int, time_str.split(':'))
+        scheduled = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        # Напоминание на 23:59, отправленное после полуночи, относится к прошлым суткам
+        if scheduled > now:
+            scheduled -= timedelta(days=1)
+        return (now - scheduled).total_seconds()
     
-    async def handle_medication_taken(self, query, medication_name, reminder_sent_time):
+    def get_medication_name(self, medication_id, user_id):
+        """Название лекарства по id: из расписания в памяти, иначе из базы"""
+        medication = self.index.medications.get(medication_id)
+        if medication is not None and medication.user_id == user_id:
+            return medication.name
+        row = self.db.get_medication(medication_id, user_id)
+        return row[1] if row else None
+    
+    async def handle_medication_taken(self, query, medication_name, reminder_sent_time, medication_id=None):
         """Обрабатывает подтверждение приема лекарства с учетом времени задержки"""
         user = query.from_user
         current_time = int(time.time())
         delay_seconds = current_time - reminder_sent_time
         delay_minutes = delay_seconds // 60
         
-        logger.info(f"User {user.id} confirmed {medication_name} with delay: {delay_minutes} minutes")
+        logger.info("User %s confirmed %s with delay: %s minutes", user.id, medication_name, delay_minutes)
+        
+        # Сохраняем прием в историю (для /export)
+        try:
+            self.db.add_intake(user.id, medication_id, medication_name, reminder_sent_time, current_time)
+        except Exception as e:
+            logger.error("Error saving intake of %s for user %s: %s", medication_name, user.id, e)
         
         # Разные реакции в зависимости от времени задержки
         if delay_minutes <= 5:
             # Вовремя (до 5 минут)
-            response = self._get_timely_response(user.first_name, medication_name)
+            key = 'taken_timely'
         elif delay_minutes <= 30:
             # Небольшая задержка (5-30 минут)
-            response = self._get_small_delay_response(user.first_name, medication_name, delay_minutes)
+            key = 'taken_small_delay'
         elif delay_minutes <= 60:
             # Средняя задержка (30-60 минут)
-            response = self._get_medium_delay_response(user.first_name, medication_name, delay_minutes)
+            key = 'taken_medium_delay'
         else:
             # Большая задержка (более 1 часа)
-            response = self._get_large_delay_response(user.first_name, medication_name, delay_minutes)
+            key = 'taken_large_delay'
+        
+        response = templates.render(
+            key,
+            locale=user.language_code,
+            user_name=user.first_name,
+            medication_name=medication_name,
+            delay_minutes=delay_minutes,
+            time_text=self._format_delay(delay_minutes)
+        )
         
         # Обновляем сообщение с напоминанием
         await query.edit_message_text(
@@ -83,102 +175,313 @@ class MedicationScheduler:
             parse_mode='Markdown'
         )
     
-    def _get_timely_response(self, user_name, medication_name):
-        """Реакция на своевременный прием"""
-        timely_praises = [
-            f"✅ **Идеально вовремя!** ✅\n\n💊 **{medication_name}** - принято точно по расписанию! 💊\n\n"
-            f"Потрясающе, {user_name}! 🎯 Ты образец дисциплины!",
-            
-            f"✅ **Супер пунктуально!** ✅\n\n💊 **{medication_name}** - принято вовремя! 💊\n\n"
-            f"Великолепно, {user_name}! ⭐ Такой подход к лечению восхищает!",
-            
-            f"✅ **Безупречно!** ✅\n\n💊 **{medication_name}** - принято точно в срок! 💊\n\n"
-            f"Браво, {user_name}! 👏 Твоя ответственность впечатляет!",
-            
-            f"✅ **Абсолютно вовремя!** ✅\n\n💊 **{medication_name}** - принято по расписанию! 💊\n\n"
-            f"Молодец, {user_name}! 💪 Регулярность - ключ к успешному лечению!"
-        ]
-        return random.choice(timely_praises)
-    
-    def _get_small_delay_response(self, user_name, medication_name, delay_minutes):
-        """Реакция на небольшую задержку (5-30 минут)"""
-        small_delay_responses = [
-            f"✅ **Лекарство принято!** ✅\n\n💊 **{medication_name}** - принято с небольшой задержкой ({delay_minutes} мин) 💊\n\n"
-            f"Хорошо, {user_name}! 😊 Но старайся принимать вовремя - это важно для эффективности лечения!",
-            
-            f"✅ **Принято!** ✅\n\n💊 **{medication_name}** - задержка {delay_minutes} минут 💊\n\n"
-            f"Неплохо, {user_name}! 📝 Завтра постарайся уложиться в срок - твое здоровье этого стоит!",
-            
-            f"✅ **Лекарство принято!** ✅\n\n💊 **{medication_name}** - небольшая задержка {delay_minutes} мин 💊\n\n"
-            f"Справился, {user_name}! 🌟 Помни: регулярный прием в одно время усиливает эффект лекарств!"
-        ]
-        return random.choice(small_delay_responses)
-    
-    def _get_medium_delay_response(self, user_name, medication_name, delay_minutes):
-        """Реакция на среднюю задержку (30-60 минут)"""
-        medium_delay_responses = [
-            f"⚠️ **Лекарство принято с опозданием** ⚠️\n\n💊 **{medication_name}** - задержка {delay_minutes} минут 💊\n\n"
-            f"{user_name}, такое опоздание может снизить эффективность лечения! ⏰ Постарайся завтра принять вовремя!",
-            
-            f"⚠️ **Принято с задержкой** ⚠️\n\n💊 **{medication_name}** - опоздание на {delay_minutes} мин 💊\n\n"
-            f"{user_name}, помни что регулярность приема критически важна! 🔬 Завтра поставь будильник напоминание!",
-            
-            f"⚠️ **Значительная задержка** ⚠️\n\n💊 **{medication_name}** - принято через {delay_minutes} минут 💊\n\n"
-            f"{user_name}, твое здоровье требует внимания! 💊 Постарайся не пропускать время приема - это влияет на результат лечения!"
-        ]
-        return random.choice(medium_delay_responses)
+    @staticmethod
+    def _format_delay(delay_minutes):
+        """Задержка текстом: 'N ч M мин' или 'M мин'"""
+        delay_hours, delay_remaining_minutes = divmod(delay_minutes, 60)
+        if delay_hours > 0:
+            return f"{delay_hours} ч {delay_remaining_minutes} мин"
+        return f"{delay_minutes} мин"
     
-    def _get_large_delay_response(self, user_name, medication_name, delay_minutes):
-        """Реакция на большую задержку (более 1 часа)"""
-        delay_hours = delay_minutes // 60
-        delay_remaining_minutes = delay_minutes % 60
+    def schedule_medication_reminders(self):
+        """Создает напоминания для всех активных лекарств"""
+        started = time.perf_counter()
+        self.index = ScheduleIndex.from_rows(self.db.get_all_medications(), on_error=self._log_schedule_error)
         
-        time_text = f"{delay_hours} ч {delay_remaining_minutes} мин" if delay_hours > 0 else f"{delay_minutes} мин"
+        # Очищаем старые задания рассылки (остальные задания планировщика не трогаем)
+        for job in self.scheduler.get_jobs():
+            if job.id.startswith(TICK_JOB_PREFIX):
+                job.remove()
         
-        large_delay_responses = [
-            f"🚨 **Критическая задержка!** 🚨\n\n💊 **{medication_name}** - принято через {time_text} 💊\n\n"
-            f"{user_name}, такая задержка серьезно снижает эффективность лечения! 🏥 Обсуди с врачом возможность скорректировать график!",
-            
-            f"🚨 **Опасно опоздал!** 🚨\n\n💊 **{medication_name}** - задержка {time_text} 💊\n\n"
-            f"{user_name}, пропуск времени приема может быть опасен! 📞 Если возникают сложности с графиком - проконсультируйся с врачом!",
-            
-            f"🚨 **Серьезное нарушение графика!** 🚨\n\n💊 **{medication_name}** - опоздание на {time_text} 💊\n\n"
-            f"{user_name}, для эффективного лечения необходим регулярный прием! 💡 Рассмотри возможность установки дополнительных напоминаний!"
-        ]
-        return random.choice(large_delay_responses)
+        for minute in self.index.minutes():
+            self._add_tick_job(minute)
+        
+        logger.info("Scheduled %d reminders for %d medications in %.2f s",
+                    self.index.dose_count(), len(self.index), time.perf_counter() - started)
     
-    def schedule_medication_reminders(self):
-        """Создает напоминания для всех активных лекарств"""
-        # Очищаем старые задания
-        self.scheduler.remove_all_jobs()
+    @staticmethod
+    def _log_schedule_error(medication_id, schedule, error):
+        logger.error("Error parsing schedule %r of medication %s: %s", schedule, medication_id, error)
+    
+    def upsert_medication(self, medication_id, user_id, name, dosage, schedule):
+        """Добавляет или обновляет одно лекарство в расписании без полной перестройки"""
+        try:
+            times = parse_schedule(schedule)
+        except ValueError as e:
+            self._log_schedule_error(medication_id, schedule, e)
+            return False
+        before = set(self.index.minutes())
+        self.index.remove(medication_id)
+        self.index.add(Medication(medication_id, user_id, name, dosage, times))
+        self._sync_tick_jobs(before)
+        self._touch(medication_id)
+        return True
+    
+    def remove_medication(self, medication_id):
+        """Убирает лекарство из расписания"""
+        before = set(self.index.minutes())
+        self.index.remove(medication_id)
+        self._sync_tick_jobs(before)
+        self._touch(medication_id)
+    
+    def _touch(self, medication_id):
+        if self._touched is not None:
+            self._touched.add(medication_id)
+    
+    async def reload(self):
+        """Сверяет расписание в памяти с базой и применяет только изменения.
+        Возвращает (добавлено, изменено, удалено) лекарств.
+        """
+        async with self._reload_lock:
+            started = time.perf_counter()
+            # Чтение идет в потоке; лекарства, измененные обработчиками за это время,
+            # в прочитанном снимке могут быть устаревшими - их оставляем как есть
+            self._touched = set()
+            try:
+                version, fresh, snapshot_rows = await asyncio.to_thread(self._load_from_database)
+                added, changed, removed = self._apply_index(fresh, self._touched)
+            finally:
+                self._touched = None
+            logger.info("Schedule reloaded in %.2f s: %d added, %d changed, %d removed",
+                        time.perf_counter() - started, added, changed, removed)
+        await asyncio.to_thread(self._write_snapshot, version, snapshot_rows)
+        return added, changed, removed
+    
+    def _apply_index(self, fresh, touched=()):
+        """Приводит расписание в памяти к fresh, меняя только отличающиеся лекарства и задания.
+        Для лекарств из touched актуально расписание в памяти, а не fresh.
+        """
+        for medication_id in touched:
+            fresh.remove(medication_id)
+            current = self.index.medications.get(medication_id)
+            if current is not None:
+                fresh.add(current)
         
-        medications = self.db.get_all_medications()
+        before = set(self.index.minutes())
+        if not self.index.medications:
+            # Первая загрузка: сравнивать не с чем
+            self.index = fresh
+            self._sync_tick_jobs(before)
+            return len(fresh), 0, 0
         
-        for user_id, name, dosage, schedule in medications:
-            # Парсим расписание "08:00, 20:00" в отдельные времена
-            times = [t.strip() for t in schedule.split(',')]
-            
-            for time_str in times:
-                if ':' in time_str:  # Проверяем что это время
-                    try:
-                        hour, minute = map(int, time_str.split(':'))
-                        
-                        # Создаем задание в планировщике
-                        trigger = CronTrigger(hour=hour, minute=minute, timezone='Europe/Moscow')
-                        self.scheduler.add_job(
-                            self.send_reminder,
-                            trigger,
-                            args=[user_id, name, dosage, time_str],
-                            id=f"med_{user_id}_{name}_{time_str}",
-                            replace_existing=True
-                        )
-                        
-                        logger.info(f"Scheduled reminder for {name} at {time_str} (MSK)")
-                    except ValueError as e:
-                        logger.error(f"Error parsing time {time_str}: {e}")
+        removed = [medication_id for medication_id in self.index.medications
+                   if medication_id not in fresh]
+        for medication_id in removed:
+            self.index.remove(medication_id)
+        
+        added = changed = 0
+        for medication in fresh.medications.values():
+            current = self.index.medications.get(medication.id)
+            if current == medication:
+                continue
+            if current is None:
+                added += 1
+            else:
+                self.index.remove(medication.id)
+                changed += 1
+            self.index.add(medication)
+        self._sync_tick_jobs(before)
+        return added, changed, len(removed)
+    
+    def _load_from_database(self):
+        """Читает расписание из базы (вызывается в потоке).
+        Возвращает (версия, индекс, строки для снимка на диске).
+        """
+        version, rows = self.db.get_versioned_medications()
+        index = ScheduleIndex.from_rows(rows, on_error=self._log_schedule_error)
+        # Строки снимка собираем, пока индекс еще не виден обработчикам и не меняется
+        return version, index, index.snapshot_rows()
+    
+    def _load_from_snapshot(self):
+        """Расписание из снимка, если он соответствует текущей версии в базе, иначе None"""
+        if not self.snapshot_path:
+            return None
+        snapshot = load_snapshot(self.snapshot_path)
+        if snapshot is None:
+            return None
+        version, rows = snapshot
+        current_version = self.db.get_schedule_version()
+        if version != current_version:
+            logger.info("Schedule snapshot is stale (version %s, database %s)", version, current_version)
+            return None
+        self._snapshot_version = version
+        return ScheduleIndex.from_snapshot_rows(rows)
+    
+    def _write_snapshot(self, version, rows):
+        # Версия только растет: более старое расписание не должно затереть свежий снимок
+        if not self.snapshot_path or (self._snapshot_version is not None and version <= self._snapshot_version):
+            return
+        try:
+            save_snapshot(self.snapshot_path, version, rows)
+            self._snapshot_version = version
+        except OSError as e:
+            logger.error("Cannot write schedule snapshot %s: %s", self.snapshot_path, e)
+    
+    def save_snapshot(self):
+        """Обновляет снимок, если расписание в базе изменилось (при остановке, вызывается в потоке)"""
+        if not self.snapshot_path or self.db.get_schedule_version() == self._snapshot_version:
+            return
+        version, _, rows = self._load_from_database()
+        self._write_snapshot(version, rows)
+    
+    async def warm_up(self, catch_up_seconds=0):
+        """Загружает расписание после запуска: из снимка, а если он устарел - из базы.
+        Затем досылает напоминания, пропущенные за последние catch_up_seconds секунд.
+        """
+        started = time.perf_counter()
+        async with self._reload_lock:
+            # Лекарства, измененные обработчиками во время загрузки, берутся из памяти
+            self._touched = set()
+            try:
+                source = 'snapshot'
+                snapshot_rows = None
+                fresh = await asyncio.to_thread(self._load_from_snapshot)
+                if fresh is None:
+                    source = 'database'
+                    version, fresh, snapshot_rows = await asyncio.to_thread(self._load_from_database)
+                self._apply_index(fresh, self._touched)
+            finally:
+                self._touched = None
+        logger.info("Schedule ready from %s in %.2f s: %d reminders for %d medications",
+                    source, time.perf_counter() - started, self.index.dose_count(), len(self.index))
+        
+        # Снимок для следующего запуска пишем уже после того, как расписание заработало
+        if snapshot_rows is not None:
+            await asyncio.to_thread(self._write_snapshot, version, snapshot_rows)
+        
+        if catch_up_seconds > 0:
+            await self._catch_up(catch_up_seconds)
+    
+    async def _catch_up(self, catch_up_seconds):
+        """Отправляет напоминания минут, пропущенных пока бот не работал (не дальше catch_up_seconds назад)"""
+        last_dispatch = await asyncio.to_thread(self.db.get_meta, LAST_DISPATCH_KEY)
+        if last_dispatch is None:
+            return
+        now = int(time.time())
+        # Текущая минута тоже: ее задание, добавленное после начала минуты, сработает только завтра
+        first = max(last_dispatch + 60, now - catch_up_seconds) // 60 * 60
+        missed = []
+        for moment in range(first, now // 60 * 60 + 60, 60):
+            local = datetime.fromtimestamp(moment, self.timezone)
+            minute = local.hour * 60 + local.minute
+            if minute in self.index.buckets:
+                missed.append(minute)
+        for minute in missed:
+            logger.warning("Catching up reminders for %s missed during restart", format_minute(minute))
+            await self._dispatch_minute(minute)
+    
+    def request_reload(self):
+        """Запускает reload в фоне (для обработчика сигнала SIGHUP)"""
+        task = asyncio.get_running_loop().create_task(self.reload())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+    
+    def _sync_tick_jobs(self, minutes_before):
+        """Создает задания для минут, на которые появились приемы, и удаляет задания опустевших минут"""
+        minutes_after = self.index.minutes()
+        added = minutes_after - minutes_before
+        removed = minutes_before - minutes_after
+        # Каждый add_job у работающего AsyncIOScheduler будит его через call_soon_threadsafe.
+        # Сотни таких вызовов подряд переполняют self-pipe event loop, и пришедший в этот
+        # момент SIGTERM теряется - поэтому пачку заданий добавляем на паузе, с одним пробуждением
+        bulk = self.scheduler.state == STATE_RUNNING and len(added) + len(removed) > 1
+        if bulk:
+            self.scheduler.pause()
+        try:
+            for minute in added:
+                self._add_tick_job(minute)
+            for minute in removed:
+                try:
+                    self.scheduler.remove_job(f"{TICK_JOB_PREFIX}{minute}")
+                except JobLookupError:
+                    pass
+        finally:
+            if bulk:
+                self.scheduler.resume()
+    
+    def _add_tick_job(self, minute):
+        """Создает задание, рассылающее все напоминания указанной минуты суток"""
+        trigger = CronTrigger(hour=minute // 60, minute=minute % 60, timezone=self.timezone)
+        self.scheduler.add_job(
+            self._dispatch_minute,
+            trigger,
+            args=[minute],
+            id=f"{TICK_JOB_PREFIX}{minute}",
+            replace_existing=True,
+            misfire_grace_time=MISFIRE_GRACE_SECONDS,
+            coalesce=True
+        )
+    
+    async def _dispatch_minute(self, minute):
+        """Отправляет напоминания всех лекарств, назначенных на эту минуту"""
+        if self.stopping:
+            return
+        time_str = format_minute(minute)
+        # Начало минуты, к которой относится рассылка (задание может запуститься с опозданием)
+        scheduled_at = round((time.time() - self._dispatch_lag(time_str)) / 60) * 60
+        if scheduled_at in self._dispatched:
+            # Минуту уже разослали: досылка после запуска совпала с заданием
+            return
+        self._dispatched = {moment for moment in self._dispatched
+                            if moment > scheduled_at - DISPATCHED_MEMORY_SECONDS}
+        self._dispatched.add(scheduled_at)
+        
+        medications = self.index.due(minute)
+        task = asyncio.current_task()
+        self._dispatches.add(task)
+        try:
+            # Текст напоминания собирается только в момент отправки
+            await asyncio.gather(*(
+                self.send_reminder(medication.user_id, medication.name, medication.dosage, time_str, medication.id)
+                for medication in medications
+            ))
+        finally:
+            self._dispatches.discard(task)
+        logger.info("Dispatched %d reminders for %s", len(medications), time_str)
+        
+        # Запоминаем минуту рассылки: после перезапуска пропущенные минуты досылаются (см. _catch_up)
+        try:
+            await asyncio.to_thread(self.db.advance_meta, LAST_DISPATCH_KEY, scheduled_at)
+        except Exception as e:
+            logger.error("Cannot save last dispatch time: %s", e)
+    
+    def add_interval_job(self, func, seconds, job_id):
+        """Добавляет периодическое служебное задание (синхронные функции выполняются в пуле потоков)"""
+        self.scheduler.add_job(
+            func,
+            'interval',
+            seconds=seconds,
+            id=job_id,
+            replace_existing=True,
+            coalesce=True,
+            max_instances=1
+        )
     
     def start(self):
-        """Запускает планировщик"""
-        self.schedule_medication_reminders()
+        """Запускает планировщик; расписание загружается отдельно (см. warm_up)"""
         self.scheduler.start()
-        logger.info("Medication scheduler started with Moscow timezone")
\ No newline at end of file
+        logger.info("Medication scheduler started with Moscow timezone")
+    
+    async def shutdown(self, timeout=30):
+        """Останавливает планировщик и ждет текущие рассылки не дольше timeout секунд"""
+        self.stopping = True
+        if self.scheduler.running:
+            # Сначала только останавливаем новые срабатывания: shutdown() исполнителя
+            # отменяет выполняющиеся корутины, поэтому вызывается после ожидания рассылок
+            self.scheduler.pause()
+        
+        pending = set(self._dispatches)
+        if pending:
+            logger.info("Waiting for %d reminder dispatches to finish", len(pending))
+            done, pending = await asyncio.wait(pending, timeout=timeout)
+        if pending:
+            logger.warning("%d reminder dispatches did not finish in %s s, cancelling", len(pending), timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        if self.scheduler.running:
+            # wait=False - не блокируем event loop
+            self.scheduler.shutdown(wait=False)
+        for task in self._background_tasks:
+            task.cancel()
+        logger.info("Medication scheduler stopped")
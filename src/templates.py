@@ -0,0 +1,113 @@
+import random
+from functools import lru_cache
+
+from telegram import helpers
+
+DEFAULT_LOCALE = 'ru'
+
+
+@lru_cache(maxsize=4096)
+def escape_markdown(text):
+    """Экранирует разметку Markdown (legacy) в пользовательском тексте (результат кэшируется)"""
+    return helpers.escape_markdown(text, version=1)
+
+
+class TemplateRegistry:
+    """Реестр шаблонов сообщений по (локаль, ключ).
+
+    Варианты сохраняются один раз при регистрации как кортеж готовых функций
+    форматирования. При отрисовке выбирается один вариант, строковые значения
+    экранируются для Markdown, поэтому пользовательский ввод не может сломать
+    разметку.
+    """
+
+    def __init__(self, default_locale=DEFAULT_LOCALE):
+        self.default_locale = default_locale
+        self._templates = {}
+
+    def register(self, locale, key, *variants):
+        if not variants:
+            raise ValueError(f"template {key!r} has no variants")
+        self._templates[(locale, key)] = tuple(variant.format_map for variant in variants)
+
+    def variants(self, key, locale=None):
+        """Варианты шаблона для локали (или локали по умолчанию)"""
+        templates = self._templates.get((locale, key))
+        if templates is None:
+            templates = self._templates[(self.default_locale, key)]
+        return templates
+
+    def render(self, key, locale=None, **values):
+        templates = self.variants(key, locale)
+        render = templates[0] if len(templates) == 1 else random.choice(templates)
+        for name, value in values.items():
+            if isinstance(value, str):
+                values[name] = escape_markdown(value)
+        return render(values)
+
+
+templates = TemplateRegistry()
+
+templates.register('ru', 'welcome', (
+    "**Добро пожаловать, {first_name}!**\n\n"
+    "Я твой персональный помощник для регулярного приема лекарств!"
+))
+
+templates.register('ru', 'reminder', (
+    "🔔 **Время принять лекарство!**\n\n"
+    "💊 **Лекарство:** {medication_name}\n"
+    "📋 **Дозировка:** {dosage}\n"
+    "⏰ **Время:** {time_str}\n\n"
+    "Нажми кнопку ниже когда примешь лекарство!"
+))
+
+templates.register(
+    'ru', 'taken_timely',
+    "✅ **Идеально вовремя!** ✅\n\n💊 **{medication_name}** - принято точно по расписанию! 💊\n\n"
+    "Потрясающе, {user_name}! 🎯 Ты образец дисциплины!",
+
+    "✅ **Супер пунктуально!** ✅\n\n💊 **{medication_name}** - принято вовремя! 💊\n\n"
+    "Великолепно, {user_name}! ⭐ Такой подход к лечению восхищает!",
+
+    "✅ **Безупречно!** ✅\n\n💊 **{medication_name}** - принято точно в срок! 💊\n\n"
+    "Браво, {user_name}! 👏 Твоя ответственность впечатляет!",
+
+    "✅ **Абсолютно вовремя!** ✅\n\n💊 **{medication_name}** - принято по расписанию! 💊\n\n"
+    "Молодец, {user_name}! 💪 Регулярность - ключ к успешному лечению!",
+)
+
+templates.register(
+    'ru', 'taken_small_delay',
+    "✅ **Лекарство принято!** ✅\n\n💊 **{medication_name}** - принято с небольшой задержкой ({delay_minutes} мин) 💊\n\n"
+    "Хорошо, {user_name}! 😊 Но старайся принимать вовремя - это важно для эффективности лечения!",
+
+    "✅ **Принято!** ✅\n\n💊 **{medication_name}** - задержка {delay_minutes} минут 💊\n\n"
+    "Неплохо, {user_name}! 📝 Завтра постарайся уложиться в срок - твое здоровье этого стоит!",
+
+    "✅ **Лекарство принято!** ✅\n\n💊 **{medication_name}** - небольшая задержка {delay_minutes} мин 💊\n\n"
+    "Справился, {user_name}! 🌟 Помни: регулярный прием в одно время усиливает эффект лекарств!",
+)
+
+templates.register(
+    'ru', 'taken_medium_delay',
+    "⚠️ **Лекарство принято с опозданием** ⚠️\n\n💊 **{medication_name}** - задержка {delay_minutes} минут 💊\n\n"
+    "{user_name}, такое опоздание может снизить эффективность лечения! ⏰ Постарайся завтра принять вовремя!",
+
+    "⚠️ **Принято с задержкой** ⚠️\n\n💊 **{medication_name}** - опоздание на {delay_minutes} мин 💊\n\n"
+    "{user_name}, помни что регулярность приема критически важна! 🔬 Завтра поставь будильник напоминание!",
+
+    "⚠️ **Значительная задержка** ⚠️\n\n💊 **{medication_name}** - принято через {delay_minutes} минут 💊\n\n"
+    "{user_name}, твое здоровье требует внимания! 💊 Постарайся не пропускать время приема - это влияет на результат лечения!",
+)
+
+templates.register(
+    'ru', 'taken_large_delay',
+    "🚨 **Критическая задержка!** 🚨\n\n💊 **{medication_name}** - принято через {time_text} 💊\n\n"
+    "{user_name}, такая задержка серьезно снижает эффективность лечения! 🏥 Обсуди с врачом возможность скорректировать график!",
+
+    "🚨 **Опасно опоздал!** 🚨\n\n💊 **{medication_name}** - задержка {time_text} 💊\n\n"
+    "{user_name}, пропуск времени приема может быть опасен! 📞 Если возникают сложности с графиком - проконсультируйся с врачом!",
+
+    "🚨 **Серьезное нарушение графика!** 🚨\n\n💊 **{medication_name}** - опоздание на {time_text} 💊\n\n"
+    "{user_name}, для эффективного лечения необходим регулярный прием! 💡 Рассмотри возможность установки дополнительных напоминаний!",
+)
@@ -0,0 +1,42 @@
+import asyncio
+import os
+import time
+from collections import Counter
+from datetime import datetime
+from unittest.mock import AsyncMock
+
+from database import Database
+from scheduler import LAST_DISPATCH_KEY, MedicationScheduler
+
+
+def test_catch_up_and_tick_send_each_minute_once(tmp_path):
+    db = Database(os.path.join(tmp_path, 'medications.db'))
+    scheduler = MedicationScheduler('123:TEST', db)
+    now = time.time()
+    missed = datetime.fromtimestamp(now - 120, scheduler.timezone)
+    current = datetime.fromtimestamp(now, scheduler.timezone)
+    db.add_user(1, 'user', 'User', None)
+    db.add_medication(1, 'Аспирин', '1 таблетка', f"{missed:%H:%M}, {current:%H:%M}")
+    db.advance_meta(LAST_DISPATCH_KEY, int(now - 300) // 60 * 60)
+    scheduler.schedule_medication_reminders()
+    scheduler.send_reminder = AsyncMock()
+
+    async def run():
+        # Задание текущей минуты срабатывает, пока идет досылка пропущенных
+        await asyncio.gather(
+            scheduler._catch_up(600),
+            scheduler._dispatch_minute(current.hour * 60 + current.minute),
+        )
+
+    asyncio.run(run())
+
+    sent = Counter(call.args[3] for call in scheduler.send_reminder.await_args_list)
+    assert sent == {f"{missed:%H:%M}": 1, f"{current:%H:%M}": 1}
+    assert db.get_meta(LAST_DISPATCH_KEY) == int(current.timestamp()) // 60 * 60
+
+
+def test_last_dispatch_marker_never_moves_backwards(tmp_path):
+    db = Database(os.path.join(tmp_path, 'medications.db'))
+    db.advance_meta(LAST_DISPATCH_KEY, 1200)
+    db.advance_meta(LAST_DISPATCH_KEY, 600)
+    assert db.get_meta(LAST_DISPATCH_KEY) == 1200
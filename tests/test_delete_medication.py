@@ -0,0 +1,39 @@
+import asyncio
+import os
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import bot
+from database import Database
+from scheduler import MedicationScheduler, TICK_JOB_PREFIX
+
+
+def tick_job_ids(scheduler):
+    return {job.id for job in scheduler.scheduler.get_jobs() if job.id.startswith(TICK_JOB_PREFIX)}
+
+
+def test_delete_button_removes_medication_from_live_schedule(tmp_path, monkeypatch):
+    db = Database(os.path.join(tmp_path, 'medications.db'))
+    db.add_user(1, 'user', 'User', None)
+    medication_id = db.add_medication(1, 'Аспирин', '1 таблетка', '08:00')
+    scheduler = MedicationScheduler('123:TEST', db)
+    scheduler.schedule_medication_reminders()
+    monkeypatch.setattr(bot, 'db', db)
+    monkeypatch.setattr(bot, 'scheduler', scheduler)
+
+    assert [medication.id for medication in scheduler.index.due(480)] == [medication_id]
+    assert f'{TICK_JOB_PREFIX}480' in tick_job_ids(scheduler)
+
+    message = SimpleNamespace(edit_text=AsyncMock(), reply_text=AsyncMock())
+    query = SimpleNamespace(
+        data=f'delete_{medication_id}',
+        from_user=SimpleNamespace(id=1),
+        message=message,
+        answer=AsyncMock(),
+    )
+    update = SimpleNamespace(callback_query=query, effective_user=query.from_user)
+    asyncio.run(bot.button_handler(update, None))
+
+    assert scheduler.index.due(480) == []
+    assert medication_id not in scheduler.index
+    assert f'{TICK_JOB_PREFIX}480' not in tick_job_ids(scheduler)
@@ -0,0 +1,25 @@
+import asyncio
+import os
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import bot
+import export
+from database import Database
+from scheduler import MedicationScheduler
+
+
+def test_export_over_upload_limit_is_refused(tmp_path, monkeypatch):
+    db = Database(os.path.join(tmp_path, 'medications.db'))
+    db.add_user(1, 'user', 'User', None)
+    db.add_medication(1, 'Аспирин', '1 таблетка', '08:00')
+    monkeypatch.setattr(bot, 'db', db)
+    monkeypatch.setattr(bot, 'scheduler', MedicationScheduler('123:TEST', db))
+    monkeypatch.setattr(export, 'MAX_UPLOAD_SIZE', 10)
+
+    message = SimpleNamespace(reply_document=AsyncMock(), reply_text=AsyncMock())
+    asyncio.run(bot.send_export(message, 1))
+
+    message.reply_document.assert_not_awaited()
+    message.reply_text.assert_awaited_once()
+    assert '/export zip' in message.reply_text.await_args.args[0]
@@ -0,0 +1,36 @@
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import bot
+from database import Database
+from scheduler import MedicationScheduler
+
+
+def test_took_button_for_other_users_medication_does_not_leak_dosage(tmp_path, monkeypatch):
+    db = Database(os.path.join(tmp_path, 'medications.db'))
+    db.add_user(1, 'owner', 'Owner', None)
+    db.add_user(2, 'other', 'Other', None)
+    medication_id = db.add_medication(1, 'Секрет', 'личная дозировка', '08:00')
+    scheduler = MedicationScheduler('123:TEST', db)
+    scheduler.schedule_medication_reminders()
+    monkeypatch.setattr(bot, 'db', db)
+    monkeypatch.setattr(bot, 'scheduler', scheduler)
+
+    # Пользователь 2 подделывает callback с id чужого лекарства
+    query = SimpleNamespace(
+        data=f'took_{medication_id}_{int(time.time())}',
+        from_user=SimpleNamespace(id=2, first_name='Other', language_code='ru'),
+        message=SimpleNamespace(edit_text=AsyncMock(), reply_text=AsyncMock()),
+        answer=AsyncMock(),
+        edit_message_text=AsyncMock(),
+    )
+    update = SimpleNamespace(callback_query=query, effective_user=query.from_user)
+    asyncio.run(bot.button_handler(update, None))
+
+    rows = [row for chunk in db.iter_user_intakes(2) for row in chunk]
+    assert len(rows) == 1
+    assert rows[0][0] == 'Лекарство'
+    assert rows[0][1] is None
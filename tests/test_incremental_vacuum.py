@@ -0,0 +1,33 @@
+import os
+import sqlite3
+
+from database import Database
+
+
+def auto_vacuum_mode(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_new_database_is_created_incremental(tmp_path):
+    path = os.path.join(tmp_path, 'medications.db')
+    Database(path)
+    assert auto_vacuum_mode(path) == 2
+
+
+def test_existing_database_is_converted_only_on_request(tmp_path):
+    path = os.path.join(tmp_path, 'medications.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE legacy (id INTEGER PRIMARY KEY)')
+    conn.close()
+
+    db = Database(path)
+    # Запуск бота не переписывает существующую базу
+    assert auto_vacuum_mode(path) == 0
+
+    assert db.enable_incremental_vacuum() is True
+    assert auto_vacuum_mode(path) == 2
+    assert db.enable_incremental_vacuum() is False
@@ -0,0 +1,31 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import bot
+from drug_index import drug_index
+
+
+def inline_update(text):
+    query = SimpleNamespace(query=text, answer=AsyncMock())
+    return SimpleNamespace(inline_query=query, effective_user=SimpleNamespace(id=1)), query
+
+
+def test_inline_query_suggests_names_by_prefix():
+    name = drug_index.name_at(0)
+    update, query = inline_update(name[:3])
+    asyncio.run(bot.inline_medication_name(update, None))
+
+    results = query.answer.await_args.args[0]
+    titles = [result.title for result in results]
+    assert name in titles
+    assert all(title.casefold().startswith(name[:3].casefold()) for title in titles)
+    # Выбранный вариант отправляется в чат точным названием из словаря
+    chosen = results[titles.index(name)]
+    assert chosen.input_message_content.message_text == name
+
+
+def test_inline_query_waits_for_a_few_characters():
+    update, query = inline_update('а')
+    asyncio.run(bot.inline_medication_name(update, None))
+    assert query.answer.await_args.args[0] == []
@@ -0,0 +1,41 @@
+import asyncio
+import os
+import threading
+
+from database import Database
+from scheduler import MedicationScheduler, TICK_JOB_PREFIX
+
+
+def test_reload_keeps_medication_added_during_read(tmp_path):
+    db = Database(os.path.join(tmp_path, 'medications.db'))
+    db.add_user(1, 'user', 'User', None)
+    db.add_medication(1, 'Аспирин', '1 таблетка', '08:00')
+    scheduler = MedicationScheduler('123:TEST', db)
+    scheduler.schedule_medication_reminders()
+
+    # Чтение базы "зависает", пока обработчик добавляет лекарство
+    stale = scheduler._load_from_database()
+    read_started = threading.Event()
+    release = threading.Event()
+
+    def slow_load():
+        read_started.set()
+        release.wait(5)
+        return stale
+
+    scheduler._load_from_database = slow_load
+
+    async def run():
+        reload = asyncio.create_task(scheduler.reload())
+        await asyncio.to_thread(read_started.wait, 5)
+        medication_id = db.add_medication(1, 'Витамин D', '1 капсула', '09:15')
+        scheduler.upsert_medication(medication_id, 1, 'Витамин D', '1 капсула', '09:15')
+        release.set()
+        await reload
+        return medication_id
+
+    medication_id = asyncio.run(run())
+
+    assert medication_id in scheduler.index
+    assert [medication.id for medication in scheduler.index.due(555)] == [medication_id]
+    assert f'{TICK_JOB_PREFIX}555' in {job.id for job in scheduler.scheduler.get_jobs()}
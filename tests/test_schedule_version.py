@@ -0,0 +1,23 @@
+import os
+
+from database import Database
+
+
+def test_schedule_version_ignores_archiving_inactive_rows(tmp_path):
+    db = Database(os.path.join(tmp_path, 'medications.db'))
+    db.add_user(1, 'user', 'User', None)
+    medication_id = db.add_medication(1, 'Аспирин', '1 таблетка', '08:00')
+    added = db.get_schedule_version()
+
+    db.delete_medication(medication_id, 1)
+    deactivated = db.get_schedule_version()
+    assert deactivated > added
+
+    conn = db.get_connection()
+    with conn:
+        conn.execute("UPDATE medications SET deactivated_at = '2000-01-01 00:00:00' WHERE id = ?", (medication_id,))
+    conn.close()
+    db.archive_inactive_medications(older_than_days=1)
+
+    assert db.get_medication(medication_id, 1) is None
+    assert db.get_schedule_version() == deactivated
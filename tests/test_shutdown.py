@@ -0,0 +1,35 @@
+import asyncio
+import os
+from datetime import datetime
+
+from database import Database
+from scheduler import MedicationScheduler
+
+
+def test_shutdown_waits_for_dispatch_in_flight(tmp_path):
+    db = Database(os.path.join(tmp_path, 'medications.db'))
+    scheduler = MedicationScheduler('123:TEST', db)
+    now = datetime.now(scheduler.timezone)
+    db.add_user(1, 'user', 'User', None)
+    db.add_medication(1, 'Аспирин', '1 таблетка', f"{now:%H:%M}")
+    scheduler.schedule_medication_reminders()
+    sent = []
+
+    async def slow_send(user_id, name, dosage, time_str, medication_id):
+        await asyncio.sleep(0.5)
+        sent.append(medication_id)
+
+    scheduler.send_reminder = slow_send
+
+    async def run():
+        scheduler.start()
+        # Рассылка текущей минуты запускается сразу и еще идет в момент остановки
+        scheduler.scheduler.add_job(scheduler._dispatch_minute, args=[now.hour * 60 + now.minute])
+        while not scheduler.dispatching:
+            await asyncio.sleep(0.01)
+        await scheduler.shutdown(5)
+
+    asyncio.run(run())
+
+    assert len(sent) == 1
+    assert not scheduler.scheduler.running